@@ -0,0 +1,356 @@
+"""
+Benchmarks of the booking pipeline on synthetic data.
+
+Generates a year of bookings for a number of distribution centers, loads them into a local
+SQLite database (or the database given with --db-url) and times the hot paths of the app at
+each data size. It also starts teste.py cold a few times and checks that the first paint
+stays within a budget. Results are printed and saved as JSON, so two runs can be compared:
+
+    python benchmark.py --sizes 1000 10000 100000 --output bench_results.json
+    python benchmark.py --sizes --startup-runs 10 --first-paint-budget-ms 250
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+import rules
+from billing import booking_charges, monthly_invoices
+from bulk_import import insert_schedules
+from capacity import CapacityIndex
+from change_log import ScheduleChangeLog
+from database import Database
+from export import export_schedules
+from optimizer import suggest_schedule
+from pipefy import create_pipefy_card, schedule_card
+from pipefy_stub import StubPipefyServer
+from reconcile import PipefyReconciler, card_columns
+from schedule_frame import compact_schedules, enable_copy_on_write, to_datetimes
+from schedule_ids import ScheduleIdAllocator
+from schedule_stats import ScheduleStats
+from schedule_store import ScheduleStore
+
+# Share of each load type in the synthetic bookings
+load_type_mix = {"Pallet Monoproduto": 0.5, "Pallet Misto": 0.35, "Estivado": 0.15}
+
+create_table = """
+    CREATE TABLE Schedules (
+        ID VARCHAR(32) PRIMARY KEY,
+        Supplier_Name VARCHAR(255),
+        Invoice_Number VARCHAR(64),
+        Dropoff_Date DATE,
+        Dropoff_Time VARCHAR(8),
+        Status VARCHAR(16),
+        Distribution_Center VARCHAR(32),
+        Load_Type VARCHAR(32),
+        Pallet_Number INTEGER,
+        Total_Weight INTEGER,
+        SKU_Count INTEGER,
+        Created_At VARCHAR(19)
+    )
+"""
+
+# Index recommended by ScheduleStore for the incremental refresh
+create_created_at_index = "CREATE INDEX Schedules_Created_At ON Schedules (Created_At)"
+
+
+def center_rules(n_centers):
+    """Return synthetic centers with the limits and opening hours of the real ones, cycled."""
+    real = list(rules.max_schedules)
+    centers = [f"CD-{number:02d}" for number in range(1, n_centers + 1)]
+    return {
+        "max_schedules": {center: rules.max_schedules[real[n % len(real)]] for n, center in enumerate(centers)},
+        "minimum_time": {center: rules.minimum_time[real[n % len(real)]] for n, center in enumerate(centers)},
+        "maximum_time": {center: rules.maximum_time[real[n % len(real)]] for n, center in enumerate(centers)},
+    }
+
+
+def generate_schedules(n_bookings, n_centers=3, year=2026, seed=0):
+    """
+    Generate a year of bookings with the Schedules table columns.
+
+    Parameters:
+        n_bookings (int): Number of bookings.
+        n_centers (int): Number of distribution centers.
+        year (int): Year of the drop-off dates.
+        seed (int): Seed of the random generator, so runs are comparable.
+
+    Returns:
+        pandas.DataFrame: The bookings.
+    """
+    rng = np.random.default_rng(seed)
+    limits = center_rules(n_centers)
+    centers = np.array(list(limits["max_schedules"]))
+    center = rng.choice(centers, n_bookings)
+    opening = pd.Series(center).map({name: rules.to_minutes(value)
+                                     for name, value in limits["minimum_time"].items()}).to_numpy()
+    closing = pd.Series(center).map({name: rules.to_minutes(value)
+                                     for name, value in limits["maximum_time"].items()}).to_numpy()
+    minutes = opening + rng.integers(0, (closing - opening) // 30 + 1) * 30
+    dates = pd.Timestamp(year, 1, 1) + pd.to_timedelta(rng.integers(0, 365, n_bookings), unit="D")
+    created = dates - pd.to_timedelta(rng.integers(1, 30 * 24 * 60, n_bookings), unit="min")
+    return pd.DataFrame({
+        "ID": [f"SCHEDULE-{number}" for number in range(1, n_bookings + 1)],
+        "Supplier_Name": [f"Indústria {number}" for number in rng.integers(1, 500, n_bookings)],
+        "Invoice_Number": rng.integers(10000, 99999, n_bookings).astype(str),
+        "Dropoff_Date": dates.date,
+        "Dropoff_Time": [f"{minute // 60:02d}:{minute % 60:02d}" for minute in minutes],
+        "Status": rng.choice(["Agendado", "Completo", "Cancelado"], n_bookings, p=[0.5, 0.4, 0.1]),
+        "Distribution_Center": center,
+        "Load_Type": rng.choice(list(load_type_mix), n_bookings, p=list(load_type_mix.values())),
+        "Pallet_Number": rng.integers(0, 30, n_bookings),
+        "Total_Weight": rng.integers(0, 25, n_bookings),
+        "SKU_Count": rng.integers(1, 200, n_bookings),
+        "Created_At": created.strftime("%Y-%m-%d %H:%M:%S"),
+    })
+
+# Run in a fresh interpreter for every cold start: one run of the app, then the phases timed by the tracer
+startup_script = """
+import json, sys
+from streamlit.testing.v1 import AppTest
+from tracing import tracer
+
+app = AppTest.from_file(sys.argv[1], default_timeout=120)
+app.secrets["mysql"] = {"url": sys.argv[2]}
+app.secrets["pipefy"] = {"api_token": "benchmark"}
+app.run()
+if app.exception:
+    raise SystemExit(app.exception[0].message)
+print(json.dumps({phase: values["p50_ms"] for phase, values in tracer.snapshot()["phases"].items()}))
+"""
+
+
+def measure(function, repeat, operations=1):
+    """
+    Call `function` `repeat` times.
+
+    Returns:
+        dict: p50/p99 latency of one call in milliseconds and operations per second.
+    """
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+    durations.sort()
+    return {
+        "calls": repeat,
+        "p50_ms": durations[len(durations) // 2] * 1000,
+        "p99_ms": durations[min(len(durations) - 1, int(len(durations) * 0.99))] * 1000,
+        "throughput_per_s": operations * repeat / sum(durations) if sum(durations) else None,
+    }
+
+
+def run_size(size, n_centers, db_url, stub_url, repeat):
+    schedules = generate_schedules(size, n_centers)
+    limits = center_rules(n_centers)
+    records = schedules.to_dict("records")
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = db_url or f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+        database = Database(url, connect_args={"timeout": 30} if url.startswith("sqlite") else {})
+        with database.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS Schedules"))
+            conn.execute(text("DROP TABLE IF EXISTS Sequences"))
+            conn.execute(text(create_table))
+            conn.execute(text(create_created_at_index))
+        insert_schedules(database, records)
+
+        # Reading the schedules: first load of the whole table, then an incremental refresh
+        results["load_schedules_full"] = measure(
+            lambda: ScheduleStore(database, window_days=None).get(), max(3, repeat // 10), size)
+        store = ScheduleStore(database, window_days=None, refresh_interval=0)
+        store.get()
+        results["load_schedules_incremental"] = measure(store.get, repeat)
+        # Same refresh asking the change log instead, with nothing changed: one query on its primary key
+        logged_store = ScheduleStore(database, window_days=None, refresh_interval=0,
+                                     change_log=ScheduleChangeLog(database))
+        logged_store.get()
+        results["load_schedules_change_log"] = measure(logged_store.get, repeat)
+
+        # Full-history export, streamed from the database in chunks into a file
+        export_path = os.path.join(directory, "export")
+        for export_format in ("csv", "parquet"):
+            results[f"export_{export_format}"] = measure(
+                lambda: export_schedules(database, export_path, export_format), 3, size)
+
+        # Memory of the shared schedules and a filter plus aggregation, on the rows as generated and
+        # on the compact typed snapshot kept by ScheduleStore
+        compact = compact_schedules(schedules)
+        first_center, middle_date = schedules["Distribution_Center"].iloc[0], pd.Timestamp(year=2026, month=7, day=1)
+
+        def filter_aggregate(frame):
+            rows = frame[(frame["Distribution_Center"] == first_center)
+                         & (to_datetimes(frame["Dropoff_Date"]) >= middle_date)]
+            return rows.groupby(["Status", "Load_Type"], observed=True)["Pallet_Number"].sum()
+
+        for name, frame in (("raw", schedules), ("compact", compact)):
+            results[f"filter_aggregate_{name}"] = dict(measure(lambda: filter_aggregate(frame), min(repeat, 50), size),
+                                                       memory_bytes=int(frame.memory_usage(deep=True).sum()))
+
+        # Admission check against the capacity index
+        index = CapacityIndex(max_schedules=limits["max_schedules"], minimum_time=limits["minimum_time"],
+                              maximum_time=limits["maximum_time"])
+        index.apply_rows(schedules)
+        sample = schedules.sample(min(repeat, size), random_state=0, replace=size < repeat)
+        checks = iter([(center, date, datetime.time.fromisoformat(start), load_type)
+                       for center, date, start, load_type in sample[
+                           ["Distribution_Center", "Dropoff_Date", "Dropoff_Time", "Load_Type"]
+                       ].itertuples(index=False)])
+        results["admission_check"] = measure(lambda: index.check(*next(checks)), len(sample))
+
+        # Finishing time of every booking
+        starts = [(row["Dropoff_Date"], datetime.time.fromisoformat(row["Dropoff_Time"]), row["Load_Type"])
+                  for row in records]
+        results["get_finishing_time_batch"] = measure(
+            lambda: [rules.get_finishing_time(*start) for start in starts], 3, size)
+
+        # Start times for 1000 requests per center on one day, with the greedy heuristic
+        day = schedules["Dropoff_Date"].iloc[0]
+        requests = generate_schedules(1000 * n_centers, n_centers, seed=1).assign(Dropoff_Date=day)
+        day_bookings = schedules[schedules["Dropoff_Date"] == day]
+        results["suggest_schedule_day"] = measure(
+            lambda: suggest_schedule(day_bookings, requests, max_schedules=limits["max_schedules"],
+                                     minimum_time=limits["minimum_time"], maximum_time=limits["maximum_time"]),
+            3, len(requests))
+
+        # ID allocation, one at a time and in blocks
+        allocator = ScheduleIdAllocator(database, name="benchmark")
+        results["id_allocation"] = measure(allocator.next_id, repeat)
+        block_allocator = ScheduleIdAllocator(database, name="benchmark-block", block_size=100)
+        results["id_allocation_block_100"] = measure(block_allocator.next_id, repeat)
+
+        # Statistics aggregation: first count, then one status change
+        results["statistics_initial"] = measure(lambda: ScheduleStats().apply_rows(schedules), 3, size)
+        stats = ScheduleStats()
+        stats.apply_rows(schedules)
+        one_row = schedules.iloc[:1].assign(Status="Cancelado")
+        results["statistics_update_and_summary"] = measure(
+            lambda: (stats.apply_rows(one_row), stats.summary()), repeat)
+
+        # Unloading fees of every booking, then the monthly invoices per supplier and per center
+        def bill():
+            charges = booking_charges(schedules)
+            return monthly_invoices(charges), monthly_invoices(charges, by="Distribution_Center")
+
+        results["billing_invoices"] = measure(bill, 3, size)
+
+        # Pipefy: building the card and sending it to the stub server
+        results["pipefy_payload"] = measure(lambda: [schedule_card(record) for record in records[:1000]],
+                                            3, min(size, 1000))
+        content = {"api_token": "benchmark", "pipe_id": "1"}
+        cards = iter(records * (repeat // size + 1))
+
+        def send_card():
+            title, fields = schedule_card(next(cards))
+            create_pipefy_card(dict(content, title=title, fields=fields), url=stub_url)
+
+        results["pipefy_create_card_stub"] = measure(send_card, min(repeat, 200))
+
+        # Backfill of up to 2000 missing cards, batched, against a stub with 20 ms of latency
+        missing = schedules[card_columns].iloc[:2000]
+
+        def reconcile():
+            with StubPipefyServer(latency=0.02) as reconcile_stub:
+                PipefyReconciler("benchmark", "1", url=reconcile_stub.url, checkpoint_path=None).run(missing)
+
+        results["pipefy_reconcile_stub"] = measure(reconcile, 1, len(missing))
+        database.dispose()
+    return results
+
+
+def measure_startup(runs, budget_ms, size=1000):
+    """
+    Start teste.py `runs` times, each in a new process, against a SQLite database of `size` bookings.
+
+    Returns:
+        dict: p50/p99 of the first paint and of the whole first run in milliseconds, and whether the
+            slowest first paint is within `budget_ms`.
+    """
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'startup.db')}"
+        database = Database(url)
+        with database.begin() as conn:
+            conn.execute(text(create_table))
+        insert_schedules(database, generate_schedules(size).to_dict("records"))
+        database.dispose()
+
+        env = dict(os.environ, PYTHONPATH=app_dir)
+        first_paint, rerun = [], []
+        for _ in range(runs):
+            # Started in the scratch directory, so no local file of the app (e.g. the outbox) is touched
+            output = subprocess.run([sys.executable, "-c", startup_script, os.path.join(app_dir, "teste.py"), url],
+                                    cwd=directory, env=env, capture_output=True, text=True, check=True)
+            phases = json.loads(output.stdout.strip().splitlines()[-1])
+            first_paint.append(phases["first_paint"])
+            rerun.append(phases["rerun"])
+
+    first_paint.sort()
+    rerun.sort()
+    return {
+        "runs": runs,
+        "first_paint_p50_ms": first_paint[len(first_paint) // 2],
+        "first_paint_p99_ms": first_paint[min(len(first_paint) - 1, int(len(first_paint) * 0.99))],
+        "first_run_p50_ms": rerun[len(rerun) // 2],
+        "first_run_p99_ms": rerun[min(len(rerun) - 1, int(len(rerun) * 0.99))],
+        "budget_ms": budget_ms,
+        "within_budget": first_paint[-1] <= budget_ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 10000, 100000],
+                        help="Number of bookings of each run (none to only measure the startup)")
+    parser.add_argument("--centers", type=int, default=3, help="Number of distribution centers")
+    parser.add_argument("--db-url", help="SQLAlchemy URL of a scratch database (default: temporary SQLite file). "
+                                         "The Schedules and Sequences tables are dropped and recreated.")
+    parser.add_argument("--repeat", type=int, default=500, help="Calls per measurement")
+    parser.add_argument("--startup-runs", type=int, default=5, help="Cold starts of teste.py (0 to skip)")
+    parser.add_argument("--first-paint-budget-ms", type=float, default=250,
+                        help="Slowest accepted time from the start of the script to its first element")
+    parser.add_argument("--output", default="bench_results.json", help="Where to save the results")
+    args = parser.parse_args()
+    enable_copy_on_write()  # As the apps do at start-up
+
+    report = {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "centers": args.centers,
+        "database": "sqlite" if args.db_url is None else args.db_url.split(":")[0],
+        "sizes": {},
+    }
+    with StubPipefyServer() as stub:
+        for size in args.sizes:
+            report["sizes"][str(size)] = run_size(size, args.centers, args.db_url, stub.url, args.repeat)
+            for name, result in report["sizes"][str(size)].items():
+                print(f"{size:>8} {name:<32} p50={result['p50_ms']:9.3f} ms  p99={result['p99_ms']:9.3f} ms  "
+                      f"{result['throughput_per_s'] or 0:12.0f} ops/s")
+
+    if args.startup_runs:
+        startup = report["startup"] = measure_startup(args.startup_runs, args.first_paint_budget_ms)
+        print(f"startup  first paint p50={startup['first_paint_p50_ms']:9.3f} ms  "
+              f"p99={startup['first_paint_p99_ms']:9.3f} ms  (budget {startup['budget_ms']:.0f} ms)  "
+              f"first run p50={startup['first_run_p50_ms']:9.3f} ms")
+
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.startup_runs and not report["startup"]["within_budget"]:
+        sys.exit("First paint over budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import decimal
+
+import numpy as np
+import pandas as pd
+
+from schedule_frame import to_datetimes
+
+# Unloading fee of each load type, in cents, and the booking column it is charged on.
+# Pallet loads pay per pallet; 'Estivado' (loose cargo) pays per tonne of Total_Weight.
+unloading_fees = {
+    "Pallet Monoproduto": {"label": "Pallet monoproduto", "column": "Pallet_Number", "price_cents": 3500},
+    "Pallet Misto": {"label": "Pallet misto", "column": "Pallet_Number", "price_cents": 4500},
+    "Estivado": {"label": "Estivado (por tonelada)", "column": "Total_Weight", "price_cents": 6200},
+}
+
+# Statuses that are charged: only unloads that actually happened
+billable_statuses = ("Completo",)
+
+
+def to_decimal(cents):
+    """Convert an amount in cents into a `Decimal` of reais, e.g. 3500 -> Decimal('35.00')."""
+    return decimal.Decimal(int(cents)).scaleb(-2)
+
+
+def format_brl(cents):
+    """Format an amount in cents as Brazilian reais, e.g. 123456 -> 'R$ 1.234,56'."""
+    text = f"{to_decimal(cents):,.2f}"
+    return "R$ " + text.replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def price_list():
+    """Return the price table shown to suppliers, built from `unloading_fees`."""
+    return {
+        "Tipo da carga": [fee["label"] for fee in unloading_fees.values()],
+        "Valor unitário": [format_brl(fee["price_cents"]) for fee in unloading_fees.values()],
+    }
+
+
+def booking_charges(bookings):
+    """
+    Compute the unloading fee of every booking in one pass.
+
+    Quantities are taken in thousandths (a pallet counts 1000, a tonne of weight counts 1000 per
+    tonne, rounded to the kilogram), so every amount is an exact integer number of cents; half
+    cents are rounded up.
+
+    Parameters:
+        bookings (pandas.DataFrame): Schedules with the 'Load_Type', 'Pallet_Number' and 'Total_Weight' columns.
+
+    Returns:
+        pandas.DataFrame: `bookings` with 'Quantity' (pallets or tonnes), 'Unit_Price_Cents' and 'Charge_Cents'.
+
+    Raises:
+        ValueError: If a booking has a load type without a price.
+    """
+    load_types = list(unloading_fees)
+    codes = pd.Categorical(bookings["Load_Type"], categories=load_types).codes
+    if (codes < 0).any():
+        unknown = sorted(set(bookings["Load_Type"][codes < 0].astype(str)))
+        raise ValueError(f"No unloading fee for the load types: {', '.join(unknown)}")
+
+    prices = np.array([fee["price_cents"] for fee in unloading_fees.values()], dtype=np.int64)[codes]
+    by_weight = np.array([fee["column"] == "Total_Weight" for fee in unloading_fees.values()])[codes]
+
+    pallets = pd.to_numeric(bookings["Pallet_Number"], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+    weight = pd.to_numeric(bookings["Total_Weight"], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+    milli_units = np.rint(np.where(by_weight, weight, pallets) * 1000).astype(np.int64)
+
+    charges = bookings.copy()
+    charges["Quantity"] = milli_units / 1000
+    charges["Unit_Price_Cents"] = prices
+    charges["Charge_Cents"] = (milli_units * prices + 500) // 1000
+    return charges
+
+
+def monthly_invoices(bookings, by="Supplier_Name", statuses=billable_statuses, complete_from=None):
+    """
+    Add up the unloading fees per month and per supplier (or per distribution center).
+
+    Parameters:
+        bookings (pandas.DataFrame): Schedules, with or without the columns of `booking_charges`.
+        by (str): Column the invoices are issued to, e.g. 'Supplier_Name' or 'Distribution_Center'.
+        statuses (tuple): Statuses that are charged.
+        complete_from (datetime.date): First drop-off date `bookings` holds in full (e.g. the start of
+            a window). Months that start before it would be billed in part, so they are left out.
+
+    Returns:
+        pandas.DataFrame: One row per (month, `by`), with the number of bookings, pallets, tonnes,
+            'Total_Cents' and 'Total' (a `Decimal` in reais), ordered by month and `by`.
+    """
+    columns = ["Month", by, "Bookings", "Pallets", "Tonnes", "Total_Cents", "Total"]
+    rows = bookings[bookings["Status"].isin(statuses)]
+    if complete_from is not None:
+        first_month = pd.Period(complete_from, freq="M")
+        if first_month.start_time < pd.Timestamp(complete_from):
+            first_month += 1
+        rows = rows[to_datetimes(rows["Dropoff_Date"]) >= first_month.start_time]
+    if rows.empty:
+        return pd.DataFrame(columns=columns)
+    if "Charge_Cents" not in rows:
+        rows = booking_charges(rows)
+
+    by_weight = rows["Load_Type"].map({load_type: fee["column"] == "Total_Weight"
+                                       for load_type, fee in unloading_fees.items()}).astype(bool)
+    invoices = (
+        rows.assign(
+            Month=to_datetimes(rows["Dropoff_Date"]).dt.to_period("M"),
+            Pallets=rows["Quantity"].where(~by_weight, 0),
+            Tonnes=rows["Quantity"].where(by_weight, 0),
+        )
+        .groupby(["Month", by], as_index=False, observed=True)
+        .agg(Bookings=("Charge_Cents", "size"), Pallets=("Pallets", "sum"), Tonnes=("Tonnes", "sum"),
+             Total_Cents=("Charge_Cents", "sum"))
+        .sort_values(["Month", by], ignore_index=True)
+    )
+    invoices["Month"] = invoices["Month"].astype(str)
+    invoices["Total"] = [to_decimal(cents) for cents in invoices["Total_Cents"]]
+    return invoices[columns]
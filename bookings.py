@@ -0,0 +1,66 @@
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from tracing import tracer
+
+insert_query = text("""
+    INSERT INTO Schedules
+    (ID, Supplier_Name, Invoice_Number, Dropoff_Date, Dropoff_Time, Status, Distribution_Center, Load_Type,
+    Pallet_Number, Total_Weight, SKU_Count, Created_At)
+    VALUES (:ID, :Supplier_Name, :Invoice_Number, :Dropoff_Date, :Dropoff_Time, :Status,
+            :Distribution_Center, :Load_Type, :Pallet_Number, :Total_Weight, :SKU_Count, :Created_At);
+""")
+
+
+def book_schedule(database, schedule, key, capacity, guard, change_log=None):
+    """
+    Book a schedule sent with the form: take its slot in the capacity index, then insert it.
+
+    The slot is reserved with `CapacityIndex.check_and_reserve` before the insert, so two
+    sessions cannot both get the last one, and released again if the insert fails. No lock is
+    held while the database is written. The schedule, its submission key (see
+    `SubmissionGuard.record`) and its change log entry are written in one transaction.
+
+    Parameters:
+        database (Database): Database of the Schedules table.
+        schedule (dict): The new schedule, with the Schedules table columns and its ID.
+        key (str): Submission key of the form, see `submissions.submission_key`.
+        capacity (CapacityIndex): Capacity index shared by the sessions of the process.
+        guard (SubmissionGuard): Guard the booking is sent through.
+        change_log (ScheduleChangeLog): Log the new schedule in the same transaction, if given.
+
+    Returns:
+        str or None: Why the schedule was not booked, to be shown to the user, or None once it is inserted.
+
+    Raises:
+        sqlalchemy.exc.IntegrityError: If another process already booked with the same key;
+            `SubmissionGuard.submit` then answers with the schedule of that process.
+    """
+    with tracer.span("validation"):
+        rejection = capacity.check_and_reserve(schedule["ID"], schedule["Distribution_Center"],
+                                               schedule["Dropoff_Date"], schedule["Dropoff_Time"],
+                                               schedule["Load_Type"], schedule["Status"])
+    if rejection is not None:
+        return rejection
+
+    inserted = False
+    try:
+        # Committed when the block ends, rolled back on error
+        with tracer.span("insert"), database.session() as session:
+            # The submission key first: a second process sending the same booking stops here
+            guard.record(session, key, schedule["ID"])
+            session.execute(insert_query, schedule)
+            if change_log is not None:
+                change_log.record(session, [schedule["ID"]])
+        inserted = True
+    except IntegrityError as e:
+        if guard.find(key) is not None:
+            raise
+        # Any other constraint, e.g. an ID already used
+        return f"Erro ao inserir o agendamento: {str(e)}"
+    except SQLAlchemyError as e:
+        return f"Erro ao inserir o agendamento: {str(e)}"
+    finally:
+        if not inserted:
+            capacity.remove(schedule["ID"])
+    return None
@@ -0,0 +1,208 @@
+import datetime
+
+import pandas as pd
+from sqlalchemy import text
+
+import rules
+
+# Column headers accepted in an uploaded file, mapped to the Schedules table columns
+upload_columns = {
+    "Indústria": "Supplier_Name",
+    "Número da NF": "Invoice_Number",
+    "Data": "Dropoff_Date",
+    "Horário": "Dropoff_Time",
+    "Status": "Status",
+    "Centro de Distribuição": "Distribution_Center",
+    "Tipo de Carga": "Load_Type",
+    "Número de Pallets": "Pallet_Number",
+    "Peso Total": "Total_Weight",
+    "Número de SKUs": "SKU_Count"
+}
+
+required_columns = ["Supplier_Name", "Invoice_Number", "Dropoff_Date", "Dropoff_Time",
+                    "Distribution_Center", "Load_Type"]
+
+insert_query = text("""
+    INSERT INTO Schedules
+    (ID, Supplier_Name, Invoice_Number, Dropoff_Date, Dropoff_Time, Status, Distribution_Center, Load_Type,
+    Pallet_Number, Total_Weight, SKU_Count, Created_At)
+    VALUES (:ID, :Supplier_Name, :Invoice_Number, :Dropoff_Date, :Dropoff_Time, :Status,
+            :Distribution_Center, :Load_Type, :Pallet_Number, :Total_Weight, :SKU_Count, :Created_At);
+""")
+
+
+def read_upload(uploaded_file):
+    """
+    Read a CSV or Excel file with schedules into a DataFrame with the Schedules table columns.
+
+    Parameters:
+        uploaded_file: A path or a file-like object with a `name` (e.g. from `st.file_uploader`).
+
+    Returns:
+        pandas.DataFrame: The rows of the file.
+    """
+    name = str(getattr(uploaded_file, "name", uploaded_file)).lower()
+    if name.endswith((".xlsx", ".xls")):
+        rows = pd.read_excel(uploaded_file, dtype=str)
+    else:
+        rows = pd.read_csv(uploaded_file, dtype=str)
+    return rows.rename(columns=upload_columns)
+
+
+def _parse_minutes(times):
+    # 'HH:MM' or 'HH:MM:SS' strings, time objects or timedeltas; NaN when the value is invalid
+    as_text = times.map(lambda value: value.strftime("%H:%M") if isinstance(value, datetime.time) else value)
+    parsed = pd.to_timedelta(as_text.astype(str).str.slice(0, 5) + ":00", errors="coerce")
+    return parsed.dt.total_seconds() // 60
+
+
+def _parse_dates(dates):
+    # 'AAAA-MM-DD' (and the dates Excel already typed) first, then the Brazilian 'DD/MM/AAAA';
+    # never month first, so 05/01/2026 is the 5th of January. NaT when the value is invalid
+    iso = pd.to_datetime(dates, format="ISO8601", errors="coerce")
+    return iso.fillna(pd.to_datetime(dates, format="%d/%m/%Y", errors="coerce"))
+
+
+def validate_schedules(rows):
+    """
+    Check the fields of a batch of new schedules.
+
+    Required values, known center, load type and status, valid date and time and the opening
+    window are checked for every row at once. The daily limit and the simultaneous docks are
+    left to `reserve_schedules`, which needs the shared capacity index.
+
+    Parameters:
+        rows (pandas.DataFrame or list): New schedules with the Schedules table columns.
+
+    Returns:
+        pandas.DataFrame: The rows, normalized, with an 'Accepted' flag and the rejection 'Reason'.
+    """
+    rows = pd.DataFrame(rows).reset_index(drop=True)
+    for column in required_columns:
+        if column not in rows:
+            rows[column] = None
+    if "Status" not in rows:
+        rows["Status"] = "Agendado"
+    rows["Status"] = rows["Status"].fillna("Agendado")
+    for column in ["Pallet_Number", "Total_Weight", "SKU_Count"]:
+        if column not in rows:
+            rows[column] = 0
+        rows[column] = pd.to_numeric(rows[column], errors="coerce").fillna(0).astype(int)
+
+    reason = pd.Series(None, index=rows.index, dtype=object)
+
+    def reject(mask, message):
+        reason[mask & reason.isnull()] = message
+
+    blank = rows[required_columns].apply(lambda column: column.isnull() | (column.astype(str).str.strip() == ""))
+    reject(blank.any(axis=1), "Campos obrigatórios em branco")
+    reject(~rows["Distribution_Center"].isin(list(rules.max_schedules)), "Centro de Distribuição inválido")
+    reject(~rows["Load_Type"].isin(list(rules.offloading_duration)), "Tipo de Carga inválido")
+    reject(~rows["Status"].isin(["Agendado", "Completo", "Cancelado"]), "Status inválido")
+
+    dates = _parse_dates(rows["Dropoff_Date"])
+    reject(dates.isnull(), "Data inválida")
+    reject(dates.dt.date < datetime.date.today(), "Data no passado")
+
+    minutes = _parse_minutes(rows["Dropoff_Time"])
+    reject(minutes.isnull(), "Horário inválido")
+    opening = rows["Distribution_Center"].map(
+        {center: rules.to_minutes(value) for center, value in rules.minimum_time.items()})
+    closing = rows["Distribution_Center"].map(
+        {center: rules.to_minutes(value) for center, value in rules.maximum_time.items()})
+    reject((minutes < opening) | (minutes > closing), "Fora do horário de funcionamento do Centro de Distribuição")
+
+    valid = reason.isnull()
+    rows["Dropoff_Date"] = dates.dt.date.astype(object).where(valid, rows["Dropoff_Date"].astype(object))
+    time_text = (minutes // 60).map("{:02.0f}".format) + ":" + (minutes % 60).map("{:02.0f}".format)
+    rows["Dropoff_Time"] = time_text.astype(object).where(valid, rows["Dropoff_Time"].astype(object))
+
+    rows["Accepted"] = reason.isnull()
+    rows["Reason"] = reason
+    return rows
+
+
+def reserve_schedules(rows, capacity):
+    """
+    Take the slots of the accepted rows of a batch in the shared capacity index.
+
+    Rows are checked in file order with `CapacityIndex.check_and_reserve`, under the ID they
+    will be inserted with, so rows of the same batch, other imports and the bookings sent with
+    the form all compete for the same slots. Rows that do not fit are rejected; the slots of
+    the others stay taken until they are inserted or released with `CapacityIndex.remove`.
+
+    Parameters:
+        rows (pandas.DataFrame): Rows returned by `validate_schedules`, with the 'ID' of the accepted ones.
+        capacity (CapacityIndex): Capacity index shared by the sessions of the process.
+
+    Returns:
+        pandas.DataFrame: The rows, with the rejected ones no longer 'Accepted' and without an 'ID'.
+    """
+    columns = ["ID", "Distribution_Center", "Dropoff_Date", "Dropoff_Time", "Load_Type", "Status"]
+    candidates = rows.loc[rows["Accepted"], columns]
+    for position, schedule_id, center, date, time_text, load_type, status in candidates.itertuples():
+        if status not in rules.active_statuses:
+            continue
+        rejection = capacity.check_and_reserve(schedule_id, center, date, time_text, load_type, status)
+        if rejection is not None:
+            rows.loc[position, ["Accepted", "ID", "Reason"]] = [False, None, rejection]
+    return rows
+
+
+def insert_schedules(engine, schedules, chunk_size=1000, change_log=None):
+    """
+    Insert many schedules in a single transaction.
+
+    Rows are sent in chunks through `executemany`, which the MySQL drivers turn into
+    multi-row INSERT statements. Either every row is written or, on error, none is.
+
+    Parameters:
+        engine (sqlalchemy.Engine): Engine of the database holding the Schedules table.
+        schedules (list): Schedules as dictionaries with every column of the Schedules table.
+        chunk_size (int): Rows per statement.
+        change_log (ScheduleChangeLog): Log the new schedules in the same transaction, if given.
+    """
+    with engine.begin() as conn:
+        for start in range(0, len(schedules), chunk_size):
+            conn.execute(insert_query, schedules[start:start + chunk_size])
+        if change_log is not None:
+            change_log.record(conn, [schedule["ID"] for schedule in schedules])
+
+
+def import_schedules(engine, rows, capacity, allocator, change_log=None):
+    """
+    Validate a batch of schedules and insert the accepted ones.
+
+    The accepted rows take their slots in the shared capacity index before the insert (see
+    `reserve_schedules`), and give them back if the insert fails. IDs are reserved for every
+    row that passes the field checks, so the ones of rows rejected for capacity are skipped.
+
+    Parameters:
+        engine (sqlalchemy.Engine): Engine of the database holding the Schedules table.
+        rows (pandas.DataFrame or list): New schedules with the Schedules table columns.
+        capacity (CapacityIndex): Capacity index shared by the sessions of the process.
+        allocator (ScheduleIdAllocator): Source of the new IDs, reserved with a single query.
+        change_log (ScheduleChangeLog): Log the inserted schedules, if given.
+
+    Returns:
+        pandas.DataFrame: Every row with its new 'ID' (accepted rows only), 'Accepted' and 'Reason'.
+    """
+    result = validate_schedules(rows)
+    result["ID"] = None
+    if result["Accepted"].any():
+        result.loc[result["Accepted"], "ID"] = allocator.allocate(int(result["Accepted"].sum()))
+        reserve_schedules(result, capacity)
+    accepted = result["Accepted"]
+    if accepted.any():
+        result.loc[accepted, "Created_At"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        columns = ["ID", "Supplier_Name", "Invoice_Number", "Dropoff_Date", "Dropoff_Time", "Status",
+                   "Distribution_Center", "Load_Type", "Pallet_Number", "Total_Weight", "SKU_Count", "Created_At"]
+        inserted = False
+        try:
+            insert_schedules(engine, result.loc[accepted, columns].to_dict("records"), change_log=change_log)
+            inserted = True
+        finally:
+            if not inserted:
+                for schedule_id in result.loc[accepted, "ID"]:
+                    capacity.remove(schedule_id)
+    return result
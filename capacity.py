@@ -0,0 +1,175 @@
+import bisect
+import datetime
+import threading
+
+import rules
+
+
+class DayBook:
+    """
+    Bookings of one distribution center on one day.
+
+    Keeps the number of active bookings and two sorted lists with the start and finishing
+    minutes of every unload, so the number of docks in use at any minute is found with two
+    binary searches.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.starts = []
+        self.ends = []
+
+    def add(self, start, end):
+        self.count += 1
+        bisect.insort(self.starts, start)
+        bisect.insort(self.ends, end)
+
+    def remove(self, start, end):
+        self.count -= 1
+        del self.starts[bisect.bisect_left(self.starts, start)]
+        del self.ends[bisect.bisect_left(self.ends, end)]
+
+    def occupancy_at(self, minute):
+        # Unloads are [start, end): started at or before `minute` and not yet finished
+        return bisect.bisect_right(self.starts, minute) - bisect.bisect_right(self.ends, minute)
+
+    def peak_occupancy(self, start, end):
+        """Return the highest number of docks in use during [start, end)."""
+        # Occupancy only goes up when an unload starts, so it is enough to look at `start`
+        # and at the unloads starting inside the interval
+        peak = self.occupancy_at(start)
+        first = bisect.bisect_right(self.starts, start)
+        last = bisect.bisect_left(self.starts, end)
+        for minute in self.starts[first:last]:
+            peak = max(peak, self.occupancy_at(minute))
+        return peak
+
+
+class CapacityIndex:
+    """
+    Capacity of every distribution center, indexed by (center, date).
+
+    Holds the active bookings (see `rules.active_statuses`) of each day and answers whether a
+    new booking respects the daily limit (`max_schedules`), the opening window
+    (`minimum_time`/`maximum_time`) and the number of docks unloading at the same time
+    (`max_simulatenous`). Bookings are added, moved or released one at a time with `upsert`
+    and `remove`, so the index never has to be rebuilt from the whole table.
+    """
+
+    def __init__(self, max_schedules=None, max_simultaneous=None, minimum_time=None, maximum_time=None):
+        self.max_schedules = max_schedules if max_schedules is not None else rules.max_schedules
+        self.max_simultaneous = max_simultaneous if max_simultaneous is not None else rules.max_simulatenous
+        self.minimum_time = minimum_time if minimum_time is not None else rules.minimum_time
+        self.maximum_time = maximum_time if maximum_time is not None else rules.maximum_time
+
+        # Reentrant, so `check_and_reserve` can call `check` and `upsert` while holding it
+        self._lock = threading.RLock()
+        self._days = {}
+        self._bookings = {}
+
+    def _remove(self, schedule_id):
+        booking = self._bookings.pop(schedule_id, None)
+        if booking is None:
+            return
+        key, start, end = booking
+        day = self._days[key]
+        day.remove(start, end)
+        if day.count == 0:
+            del self._days[key]
+
+    def upsert(self, schedule_id, center, date, start_time, load_type, status="Agendado"):
+        """
+        Add a booking, or update it if the ID is already known (e.g. its status changed).
+
+        Bookings whose status does not take a slot (e.g. 'Cancelado') are released.
+        """
+        with self._lock:
+            self._remove(schedule_id)
+            if status not in rules.active_statuses:
+                return
+            key = (center, rules.to_date(date))
+            start = rules.to_minutes(start_time)
+            end = start + rules.duration_minutes(load_type)
+            self._days.setdefault(key, DayBook()).add(start, end)
+            self._bookings[schedule_id] = (key, start, end)
+
+    def remove(self, schedule_id):
+        """Release the slot of a booking."""
+        with self._lock:
+            self._remove(schedule_id)
+
+    def apply_rows(self, rows, removed_ids=()):
+        """
+        Apply a batch of schedules read from the Schedules table.
+
+        Parameters:
+            rows (pandas.DataFrame): New or changed schedules.
+            removed_ids (iterable): IDs of schedules that no longer exist.
+        """
+        for schedule_id in removed_ids:
+            self.remove(schedule_id)
+        columns = ["ID", "Distribution_Center", "Dropoff_Date", "Dropoff_Time", "Load_Type", "Status"]
+        for schedule_id, center, date, start_time, load_type, status in rows[columns].itertuples(index=False):
+            self.upsert(schedule_id, center, date, start_time, load_type, status)
+
+    def count(self, center, date):
+        """Return the number of active bookings of a center on a day."""
+        day = self._days.get((center, rules.to_date(date)))
+        return day.count if day is not None else 0
+
+    def check(self, center, date, start_time, load_type):
+        """
+        Check whether a new booking fits the rules of the distribution center.
+
+        Parameters:
+            center (str): Distribution center.
+            date (datetime.date): Drop-off date.
+            start_time (datetime.time): Drop-off time; an 'HH:MM' string is accepted too.
+            load_type (str): Load type, which sets how long the unload takes.
+
+        Returns:
+            str or None: The reason why the booking is rejected, or None if it is accepted.
+        """
+        date = rules.to_date(date)
+        start_time = datetime.time(*divmod(rules.to_minutes(start_time), 60))
+        if self.count(center, date) >= self.max_schedules[center]:
+            return (f"Não é possível agendar mais de {self.max_schedules[center]} entregas para o dia {date} "
+                    f"por Centro de Distribuição.")
+        if start_time < self.minimum_time[center] or start_time > self.maximum_time[center]:
+            return f"É necessário agendar entre às {self.minimum_time[center]} e {self.maximum_time[center]}"
+
+        start = rules.to_minutes(start_time)
+        end = start + rules.duration_minutes(load_type)
+        with self._lock:
+            day = self._days.get((center, date))
+            peak = day.peak_occupancy(start, end) if day is not None else 0
+        if peak >= self.max_simultaneous:
+            return (f"Já existem {self.max_simultaneous} descargas simultâneas entre "
+                    f"{start_time.strftime('%H:%M')} e "
+                    f"{rules.get_finishing_time(date, start_time, load_type).strftime('%H:%M')}. "
+                    f"Escolha outro horário.")
+        return None
+
+    def check_and_reserve(self, schedule_id, center, date, start_time, load_type, status="Agendado"):
+        """
+        Check a new booking and, if it is accepted, take its slot right away.
+
+        `check` followed by the insert would leave a gap in which two sessions are both accepted
+        for the last slot of a day. Here the check and the provisional entry happen under one
+        lock, so the next check already sees the booking; the lock is released before returning,
+        so the caller writes to the database without holding it. If the write fails, `remove`
+        the booking to release the slot.
+
+        Parameters:
+            schedule_id (str): ID the booking will be inserted with.
+            center, date, start_time, load_type: See `check`.
+            status (str): Status of the new booking.
+
+        Returns:
+            str or None: The reason why the booking is rejected, or None if its slot is now taken.
+        """
+        with self._lock:
+            rejection = self.check(center, date, start_time, load_type)
+            if rejection is None:
+                self.upsert(schedule_id, center, date, start_time, load_type, status)
+        return rejection
@@ -0,0 +1,103 @@
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+
+class ScheduleChangeLog:
+    """
+    Version counter of the Schedules table, with the schedule changed at each version.
+
+    Every write to Schedules (insert, status change, cancellation, import) calls `record` inside
+    its own transaction. That bumps a counter row in the Sequences table and logs the IDs in
+    Schedule_Changes under the new versions. The counter row stays locked until the writer
+    commits, so versions become visible in order: a reader that has seen version `n` only
+    needs the rows logged from `n` on to know exactly which schedules to read again.
+
+    Readers poll `changes_since` with the version they have. It is a range query on the
+    primary key that returns nothing when nothing changed, so it can run every few seconds.
+
+    Parameters:
+        engine (sqlalchemy.Engine): Engine of the database holding the Schedules table.
+        name (str): Name of the counter row in Sequences.
+    """
+
+    def __init__(self, engine, name="Schedule_Changes"):
+        self.engine = engine
+        self.name = name
+        self._create()
+
+    def _create(self):
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS Sequences (
+                    Name VARCHAR(64) PRIMARY KEY,
+                    Next_Value BIGINT NOT NULL
+                )
+            """))
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS Schedule_Changes (
+                    Version BIGINT PRIMARY KEY,
+                    Schedule_ID VARCHAR(32) NOT NULL
+                )
+            """))
+            exists = conn.execute(text("SELECT 1 FROM Sequences WHERE Name = :name"), {"name": self.name}).first()
+        if exists is None:
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(text("INSERT INTO Sequences (Name, Next_Value) VALUES (:name, 1)"),
+                                 {"name": self.name})
+            except IntegrityError:
+                # Another process created the counter first
+                pass
+
+    def record(self, conn, ids):
+        """
+        Log that the schedules were written, in the caller's transaction.
+
+        Parameters:
+            conn: Connection or ORM session of the transaction that wrote the schedules.
+            ids (iterable): IDs of the schedules inserted, updated or deleted.
+
+        Returns:
+            int: The version after the change, or None if there was nothing to log.
+        """
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return None
+        conn.execute(text("UPDATE Sequences SET Next_Value = Next_Value + :count WHERE Name = :name"),
+                     {"count": len(ids), "name": self.name})
+        end = conn.execute(text("SELECT Next_Value FROM Sequences WHERE Name = :name"),
+                           {"name": self.name}).scalar_one()
+        conn.execute(text("INSERT INTO Schedule_Changes (Version, Schedule_ID) VALUES (:version, :id)"),
+                     [{"version": version, "id": schedule_id}
+                      for version, schedule_id in zip(range(end - len(ids), end), ids)])
+        return end
+
+    def version(self):
+        """Return the current version: the one the next change will get."""
+        with self.engine.connect() as conn:
+            return conn.execute(text("SELECT Next_Value FROM Sequences WHERE Name = :name"),
+                                {"name": self.name}).scalar_one()
+
+    def changes_since(self, version):
+        """
+        Return the schedules changed from `version` on.
+
+        Returns:
+            tuple: The changed IDs (a set) and the version to ask for next time, or None when the
+                log no longer goes back to `version` (see `prune`) and everything must be read again.
+        """
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("SELECT Version, Schedule_ID FROM Schedule_Changes "
+                                     "WHERE Version >= :version ORDER BY Version"), {"version": version}).all()
+        if not rows:
+            return set(), version
+        if rows[0][0] != version:
+            return None
+        return {schedule_id for _, schedule_id in rows}, rows[-1][0] + 1
+
+    def prune(self, keep=100_000):
+        """Forget all but the last `keep` versions; readers further behind reload everything."""
+        with self.engine.begin() as conn:
+            conn.execute(text("DELETE FROM Schedule_Changes WHERE Version < "
+                              "(SELECT Next_Value FROM Sequences WHERE Name = :name) - :keep"),
+                         {"name": self.name, "keep": keep})
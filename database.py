@@ -0,0 +1,167 @@
+import contextlib
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+
+class Database:
+    """
+    Access to the schedules database, shared by every session of the app.
+
+    Wraps a SQLAlchemy engine with a tuned connection pool. `connect` and `begin` work like
+    the engine methods of the same name (so the object can be passed wherever an engine is
+    expected), but also measure how long each caller waited for a pooled connection.
+    `session` gives each thread its own ORM session and commits or rolls back on exit.
+
+    Parameters:
+        url (str): SQLAlchemy database URL, e.g. 'mysql+pymysql://...' or 'sqlite:///local.db'.
+        pool_size (int): Connections kept open in the pool.
+        max_overflow (int): Extra connections opened when the pool is exhausted.
+        pool_timeout (float): Seconds to wait for a free connection before giving up.
+        pool_recycle (int): Seconds after which a connection is replaced (MySQL closes idle ones).
+        pool_pre_ping (bool): Check each connection before use, so dropped ones are replaced silently.
+    """
+
+    def __init__(self, url, pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=1800,
+                 pool_pre_ping=True, **engine_kwargs):
+        self.engine = create_engine(
+            url,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=pool_recycle,
+            pool_pre_ping=pool_pre_ping,
+            **engine_kwargs
+        )
+        self.Session = scoped_session(sessionmaker(bind=self.engine))
+
+        self._metrics_lock = threading.Lock()
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @classmethod
+    def from_config(cls, db_config, **pool_options):
+        """
+        Build the database from the `[mysql]` section of the Streamlit secrets.
+
+        A `url` key, when present, is used as is, which allows pointing the app to a local
+        SQLite or MySQL stand-in.
+        """
+        url = db_config.get("url")
+        if url is None:
+            url = (f"mysql+pymysql://{db_config['username']}:{db_config['password']}"
+                   f"@{db_config['host']}:{db_config['port']}/{db_config['database']}")
+        for option in ("pool_size", "max_overflow", "pool_timeout", "pool_recycle"):
+            if option in db_config and option not in pool_options:
+                pool_options[option] = db_config[option]
+        return cls(url, **pool_options)
+
+    def _record_wait(self, started):
+        waited = time.perf_counter() - started
+        with self._metrics_lock:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+    @contextlib.contextmanager
+    def connect(self):
+        """Check a connection out of the pool; it goes back to the pool on exit."""
+        started = time.perf_counter()
+        with self.engine.connect() as conn:
+            self._record_wait(started)
+            yield conn
+
+    @contextlib.contextmanager
+    def begin(self):
+        """Open a transaction that is committed on exit, or rolled back if an exception is raised."""
+        started = time.perf_counter()
+        with self.engine.connect() as conn:
+            self._record_wait(started)
+            with conn.begin():
+                yield conn
+
+    @contextlib.contextmanager
+    def session(self):
+        """
+        Give the current thread its own ORM session.
+
+        The session is committed on exit, rolled back if an exception is raised, and removed
+        afterwards so the next request starts clean.
+        """
+        session = self.Session()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self.Session.remove()
+
+    def pool_metrics(self):
+        """
+        Return the state of the connection pool.
+
+        Returns:
+            dict: 'pool_size', 'checked_out' (connections in use right now), 'overflow',
+                'checkouts' (total so far) and the average and maximum wait for a connection in seconds.
+        """
+        pool = self.engine.pool
+        with self._metrics_lock:
+            checkouts = self._checkouts
+            wait_total = self._wait_total
+            wait_max = self._wait_max
+        return {
+            "pool_size": pool.size() if hasattr(pool, "size") else None,
+            "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+            "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+            "checkouts": checkouts,
+            "wait_avg": wait_total / checkouts if checkouts else 0.0,
+            "wait_max": wait_max
+        }
+
+    def dispose(self):
+        """Close every pooled connection."""
+        self.Session.remove()
+        self.engine.dispose()
+
+
+if __name__ == "__main__":
+    # Offline load test: simulated users reading and writing a local SQLite database
+    # through the pool, printing the pool metrics at the end.
+    import os
+    import sys
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+
+    from sqlalchemy import text
+
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    requests_per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = Database(f"sqlite:///{os.path.join(directory, 'schedules.db')}",
+                            pool_size=5, max_overflow=5, connect_args={"timeout": 30})
+        with database.begin() as conn:
+            conn.execute(text("CREATE TABLE Schedules (ID VARCHAR(32) PRIMARY KEY, Status VARCHAR(16))"))
+
+        def user(number):
+            for request in range(requests_per_user):
+                with database.connect() as conn:
+                    conn.execute(text("SELECT COUNT(*) FROM Schedules")).scalar_one()
+                if request % 10 == 0:
+                    with database.begin() as conn:
+                        conn.execute(text("INSERT INTO Schedules VALUES (:id, 'Agendado')"),
+                                     {"id": f"SCHEDULE-{number}-{request}"})
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=users) as executor:
+            list(executor.map(user, range(users)))
+        elapsed = time.perf_counter() - started
+
+        print(f"{users} users x {requests_per_user} requests in {elapsed:.2f} s")
+        print(database.pool_metrics())
+        database.dispose()
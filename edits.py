@@ -0,0 +1,94 @@
+import hashlib
+
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+# Columns users may change in the schedules grid
+editable_columns = ["Status"]
+
+
+def editor_key(name, rows, id_column="ID"):
+    """
+    Return a `st.data_editor` key that changes whenever the schedules on screen change.
+
+    The change set of the editor refers to row positions. Tying the key to the IDs and the
+    editable values shown drops pending edits as soon as a position could point to another
+    schedule, or to a value that changed since the edit was made (another page or filter, a
+    save from another session), instead of applying them to the wrong row.
+    """
+    shown = rows[[id_column] + [column for column in editable_columns if column in rows]]
+    digest = hashlib.sha1(pd.util.hash_pandas_object(shown, index=False).to_numpy().tobytes()).hexdigest()
+    return f"{name}-{digest[:16]}"
+
+
+def editor_changes(original, edited_rows, id_column="ID"):
+    """
+    Turn the change set of `st.data_editor` into a list of changes per schedule.
+
+    Parameters:
+        original (pandas.DataFrame): The frame that was given to the editor.
+        edited_rows (dict): `st.session_state[key]["edited_rows"]`, mapping row positions to the new values.
+        id_column (str): Column holding the schedule ID.
+
+    Returns:
+        list: Tuples of (schedule ID, {column: (old value, new value)}) for the rows that really changed.
+    """
+    changes = []
+    for position, new_values in edited_rows.items():
+        row = original.iloc[int(position)]
+        changed = {column: (row[column], value) for column, value in new_values.items()
+                   if row[column] != value}
+        if changed:
+            changes.append((row[id_column], changed))
+    return changes
+
+
+def save_changes(database, changes, change_log=None):
+    """
+    Write the edits of the schedules grid with one UPDATE per kind of change.
+
+    Changes are grouped by what they do (e.g. every 'Agendado' -> 'Cancelado'), so the usual
+    case of a few status changes becomes a single `UPDATE ... WHERE ID IN (...)`. Each UPDATE
+    only touches rows that still hold the old values (optimistic concurrency): a row changed by
+    someone else since the grid was loaded is left alone and reported as a conflict.
+
+    Parameters:
+        database: Engine or `Database` of the schedules database.
+        changes (list): Output of `editor_changes`.
+        change_log (ScheduleChangeLog): Log the updated schedules in the same transaction, if given.
+
+    Returns:
+        dict: 'updated' and 'conflicts', each a list of schedule IDs.
+    """
+    groups = {}
+    for schedule_id, changed in changes:
+        for column in changed:
+            if column not in editable_columns:
+                raise ValueError(f"Column {column} cannot be edited")
+        key = tuple(sorted((column, old, new) for column, (old, new) in changed.items()))
+        groups.setdefault(key, []).append(schedule_id)
+
+    updated, conflicts = [], []
+    with database.begin() as conn:
+        for key, ids in groups.items():
+            assignments = ", ".join(f"{column} = :new_{number}" for number, (column, _, _) in enumerate(key))
+            conditions = " AND ".join(f"{column} = :old_{number}" for number, (column, _, _) in enumerate(key))
+            params = {"ids": ids}
+            for number, (_, old, new) in enumerate(key):
+                params[f"old_{number}"] = old
+                params[f"new_{number}"] = new
+            statement = text(f"UPDATE Schedules SET {assignments} WHERE ID IN :ids AND {conditions}")
+            result = conn.execute(statement.bindparams(bindparam("ids", expanding=True)), params)
+
+            if result.rowcount == len(ids):
+                updated.extend(ids)
+                continue
+            # Some rows were changed by someone else: find out which ones were updated here
+            new_conditions = " AND ".join(f"{column} = :new_{number}" for number, (column, _, _) in enumerate(key))
+            statement = text(f"SELECT ID FROM Schedules WHERE ID IN :ids AND {new_conditions}")
+            matched = set(conn.execute(statement.bindparams(bindparam("ids", expanding=True)), params).scalars())
+            updated.extend(schedule_id for schedule_id in ids if schedule_id in matched)
+            conflicts.extend(schedule_id for schedule_id in ids if schedule_id not in matched)
+        if change_log is not None:
+            change_log.record(conn, updated)
+    return {"updated": updated, "conflicts": conflicts}
@@ -0,0 +1,211 @@
+"""
+Export the history of the Schedules table to CSV, Parquet or Excel.
+
+Rows are read with a server-side cursor, `chunk_size` at a time, and every chunk is written to
+the file before the next one is read, so memory stays the same whatever the size of the table.
+From the command line:
+
+    python export.py --format parquet --output agendamentos.parquet
+    python export.py --format xlsx --output clas_2025.xlsx --center CLAS --date-from 2025-01-01 --date-to 2025-12-31
+
+The database is read from .streamlit/secrets.toml unless given with --db-url.
+"""
+import argparse
+import logging
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import text
+
+import rules
+from schedule_queries import _where
+
+logger = logging.getLogger(__name__)
+
+# Columns exported, in order, with their type in the Parquet files
+export_schema = pa.schema([
+    ("ID", pa.string()),
+    ("Supplier_Name", pa.string()),
+    ("Invoice_Number", pa.string()),
+    ("Dropoff_Date", pa.date32()),
+    ("Dropoff_Time", pa.string()),
+    ("Status", pa.string()),
+    ("Distribution_Center", pa.string()),
+    ("Load_Type", pa.string()),
+    ("Pallet_Number", pa.int64()),
+    ("Total_Weight", pa.int64()),
+    ("SKU_Count", pa.int64()),
+    ("Created_At", pa.string()),
+])
+
+export_columns = [field.name for field in export_schema]
+
+# File extension and MIME type of each format
+export_formats = {
+    "csv": {"extension": "csv", "mime": "text/csv"},
+    "parquet": {"extension": "parquet", "mime": "application/vnd.apache.parquet"},
+    "xlsx": {"extension": "xlsx", "mime": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
+}
+
+# Rows of an Excel sheet, header included; longer exports continue on a new sheet
+excel_max_rows = 1_048_576
+
+
+def read_chunks(database, filters=None, chunk_size=5000):
+    """
+    Read the schedules matching the filters, ordered by drop-off date and ID, one chunk at a time.
+
+    The connection streams the rows (a server-side cursor on MySQL), so only the chunk being
+    converted is held in memory. The connection goes back to the pool once the generator is
+    exhausted or closed.
+
+    Parameters:
+        database: Engine or `Database` of the schedules database.
+        filters (dict): See `schedule_queries._where`; exports use 'center', 'date_from' and 'date_to'.
+        chunk_size (int): Rows per chunk.
+
+    Yields:
+        pandas.DataFrame: The next chunk, with the `export_columns` normalized for writing.
+    """
+    conditions, params = _where(filters or {})
+    query = f"SELECT {', '.join(export_columns)} FROM Schedules"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY Dropoff_Date, ID"
+
+    with database.connect() as conn:
+        conn = conn.execution_options(stream_results=True, max_row_buffer=chunk_size)
+        for chunk in pd.read_sql(text(query), conn, params=params, chunksize=chunk_size):
+            yield _normalize(chunk)
+
+
+def _time_label(value):
+    if pd.isnull(value):
+        return None
+    minutes = rules.to_minutes(value)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _normalize(chunk):
+    # Same types in every chunk whatever the driver returned (MySQL TIME as timedelta, SQLite
+    # dates as text, ...), so the chunks of one file share one schema
+    rows = pd.DataFrame(index=chunk.index)
+    for field in export_schema:
+        column = chunk[field.name]
+        if field.name == "Dropoff_Date":
+            rows[field.name] = pd.to_datetime(column, errors="coerce").dt.date
+        elif field.name == "Dropoff_Time":
+            labels = {value: _time_label(value) for value in column.drop_duplicates()}
+            rows[field.name] = column.map(labels).astype("string")
+        elif pa.types.is_integer(field.type):
+            rows[field.name] = pd.to_numeric(column, errors="coerce").astype("Int64")
+        else:
+            rows[field.name] = column.astype("string")
+    return rows
+
+
+def _write_csv(chunks, file):
+    rows = 0
+    for chunk in chunks:
+        # utf-8-sig on the first chunk only, so Excel opens the accents right
+        file.write(chunk.to_csv(index=False, header=rows == 0).encode("utf-8-sig" if rows == 0 else "utf-8"))
+        rows += len(chunk)
+    if rows == 0:
+        file.write(",".join(export_columns).encode("utf-8-sig") + b"\n")
+    return rows
+
+
+def _write_parquet(chunks, file):
+    rows = 0
+    with pq.ParquetWriter(file, export_schema) as writer:
+        for chunk in chunks:
+            # One row group per chunk
+            writer.write_table(pa.Table.from_pandas(chunk, schema=export_schema, preserve_index=False))
+            rows += len(chunk)
+    return rows
+
+
+def _write_excel(chunks, file):
+    import openpyxl
+
+    # Write-only workbooks keep the rows in a temporary file instead of in memory
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet, sheet_rows, rows = None, excel_max_rows, 0
+    for chunk in chunks:
+        for values in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None):
+            if sheet_rows == excel_max_rows:
+                title = "Agendamentos" if sheet is None else f"Agendamentos {len(workbook.worksheets) + 1}"
+                sheet = workbook.create_sheet(title)
+                sheet.append(export_columns)
+                sheet_rows = 1
+            sheet.append(values)
+            sheet_rows += 1
+        rows += len(chunk)
+    if sheet is None:
+        workbook.create_sheet("Agendamentos").append(export_columns)
+    workbook.save(file)
+    return rows
+
+
+_writers = {"csv": _write_csv, "parquet": _write_parquet, "xlsx": _write_excel}
+
+
+def export_schedules(database, target, export_format="csv", filters=None, chunk_size=5000):
+    """
+    Write the schedules matching the filters to a file, chunk by chunk.
+
+    Parameters:
+        database: Engine or `Database` of the schedules database.
+        target: Path of the file, or a binary file object open for writing.
+        export_format (str): One of `export_formats`: 'csv', 'parquet' or 'xlsx'.
+        filters (dict): Optional 'center', 'date_from' and 'date_to'; see `read_chunks`.
+        chunk_size (int): Rows read and written at a time.
+
+    Returns:
+        int: Number of schedules exported.
+
+    Raises:
+        ValueError: If the format is not one of `export_formats`.
+    """
+    if export_format not in _writers:
+        raise ValueError(f"Unknown export format '{export_format}', expected one of: {', '.join(_writers)}")
+    chunks = read_chunks(database, filters, chunk_size)
+    try:
+        if isinstance(target, (str, os.PathLike)):
+            with open(target, "wb") as file:
+                return _writers[export_format](chunks, file)
+        return _writers[export_format](chunks, target)
+    finally:
+        chunks.close()
+
+
+def main():
+    from database import Database
+    from reconcile import read_secrets
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--secrets", default=os.path.join(".streamlit", "secrets.toml"),
+                        help="Streamlit secrets with the [mysql] section")
+    parser.add_argument("--db-url", help="SQLAlchemy URL of the schedules database (default: from the secrets)")
+    parser.add_argument("--format", choices=list(export_formats), default="csv", help="File format")
+    parser.add_argument("--output", required=True, help="File written")
+    parser.add_argument("--center", help="Only this distribution center")
+    parser.add_argument("--date-from", help="Only drop-offs on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--date-to", help="Only drop-offs on or before this date (YYYY-MM-DD)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Rows read and written at a time")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    database = Database(args.db_url) if args.db_url else Database.from_config(read_secrets(args.secrets)["mysql"])
+    started = time.perf_counter()
+    rows = export_schedules(database, args.output, args.format, chunk_size=args.chunk_size,
+                            filters={"center": args.center, "date_from": args.date_from, "date_to": args.date_to})
+    logger.info("%d schedules written to %s in %.1f s", rows, args.output, time.perf_counter() - started)
+    database.dispose()
+
+
+if __name__ == "__main__":
+    main()
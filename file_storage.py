@@ -0,0 +1,322 @@
+import contextlib
+import datetime
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from schedule_ids import format_schedule_id, parse_schedule_id
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no lock between processes, so run a single Streamlit process there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Columns of the schedules kept by the CSV mode, with the type stored in the Parquet files
+schedule_schema = pa.schema([
+    ("ID", pa.string()),
+    ("Indústria", pa.string()),
+    ("Número da NF", pa.string()),
+    ("Drop-off Date", pa.string()),
+    ("Drop-off Time", pa.string()),
+    ("Finishing Time", pa.string()),
+    ("Status", pa.string()),
+    ("Centro de Distribuição", pa.string()),
+    ("Tipo de Carga", pa.string()),
+    ("Número de Pallets", pa.int64()),
+    ("Peso Total", pa.int64()),
+    ("Número de SKUs", pa.int64()),
+    ("Data de Criação", pa.string()),
+    ("Updated_At", pa.string()),
+])
+
+schedule_columns = [field.name for field in schedule_schema if field.name != "Updated_At"]
+
+
+def _month(date):
+    return str(date)[:7]
+
+
+def _to_table(rows):
+    # Normalize the values so every file of every partition has exactly the same schema
+    rows = rows.reindex(columns=[field.name for field in schedule_schema]).copy()
+    for field in schedule_schema:
+        column = rows[field.name]
+        if pd.api.types.is_datetime64_dtype(column):
+            column = column.dt.strftime("%Y-%m-%d")  # Drop-off dates of a typed snapshot
+        if pa.types.is_integer(field.type):
+            rows[field.name] = pd.to_numeric(column, errors="coerce").fillna(0).astype("int64")
+        else:
+            rows[field.name] = column.map(lambda value: None if pd.isnull(value) else str(value)).astype(object)
+    return pa.Table.from_pandas(rows, schema=schedule_schema, preserve_index=False)
+
+
+class ScheduleFileStorage:
+    """
+    Schedules of the CSV mode stored as Parquet files partitioned by drop-off month.
+
+    Each month is a directory with an optional `base.parquet` and a number of small delta
+    files. New bookings and edits are written as a delta holding only the affected rows, so a
+    write costs as much as the change, not as much as the history. When a row appears in more
+    than one file the most recent version wins. A background thread (see `start_compactor`)
+    folds the deltas of a month into its base file once they pile up.
+
+    Reads are memory-mapped and limited to the months asked for, so a page only pays for the
+    partitions it shows.
+
+    Several processes may share one directory. Appending a delta needs no lock, since every file
+    has a unique name; compaction, the ID counter and checked updates read, change and write
+    shared files, so they hold `<root>/.lock` (an `fcntl.flock` lock) as well as the lock of the
+    process. Without `fcntl` (Windows) only the threads of one process are kept apart.
+
+    Parameters:
+        root (str): Directory holding the partitions.
+        legacy_csv_path (str): CSV file written by older versions; imported once if the directory does not exist.
+    """
+
+    def __init__(self, root="schedules_data", legacy_csv_path="schedules.csv"):
+        self.root = root
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._stop = threading.Event()
+        self._compactor = None
+
+        if not os.path.isdir(root):
+            os.makedirs(root)
+            if legacy_csv_path and os.path.exists(legacy_csv_path):
+                self._write_deltas(pd.read_csv(legacy_csv_path, dtype=str))
+
+    @contextlib.contextmanager
+    def _exclusive(self):
+        # The process lock keeps the threads apart; the outermost call also takes the lock file,
+        # since a second flock from the same process would wait on itself
+        with self._lock:
+            lock_file = None
+            if self._lock_depth == 0 and fcntl is not None:
+                lock_file = open(os.path.join(self.root, ".lock"), "a")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if lock_file is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    lock_file.close()
+
+    def _partition(self, month):
+        return os.path.join(self.root, f"month={month}")
+
+    def _write_deltas(self, rows):
+        if rows.empty:
+            return
+        rows = rows.copy()
+        rows["Updated_At"] = datetime.datetime.now().isoformat()
+        months = rows["Drop-off Date"].map(_month)
+        with self._lock:
+            for month, month_rows in rows.groupby(months):
+                directory = self._partition(month)
+                os.makedirs(directory, exist_ok=True)
+                # Name sorts by write time, so later files override earlier ones
+                name = f"delta-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.parquet"
+                temporary = os.path.join(directory, f".{name}.tmp")
+                pq.write_table(_to_table(month_rows), temporary)
+                os.replace(temporary, os.path.join(directory, name))
+            self._update_next_id(rows["ID"])
+
+    def months(self):
+        """Return the months that have schedules, as 'YYYY-MM' strings, in order."""
+        return sorted(os.path.basename(path).split("=", 1)[1]
+                      for path in glob.glob(os.path.join(self.root, "month=*")))
+
+    def version(self):
+        """
+        Return a value that changes whenever a file is written to or removed from a partition,
+        by this process or any other, so readers can tell when their copy is out of date.
+        """
+        paths = glob.glob(os.path.join(self.root, "month=*"))
+        return len(paths), max((os.stat(path).st_mtime_ns for path in paths), default=0)
+
+    def _files(self, month):
+        directory = self._partition(month)
+        base = os.path.join(directory, "base.parquet")
+        deltas = sorted(glob.glob(os.path.join(directory, "delta-*.parquet")))
+        return ([base] if os.path.exists(base) else []) + deltas
+
+    def _read_month(self, month):
+        while True:
+            try:
+                tables = [pq.read_table(path, memory_map=True) for path in self._files(month)]
+                break
+            except FileNotFoundError:
+                # Another process compacted the month between the listing and the read; list again
+                continue
+        if not tables:
+            return None
+        table = pa.concat_tables(tables)
+        rows = table.to_pandas()
+        # Keep the latest version of each schedule
+        return rows.drop_duplicates(subset="ID", keep="last")
+
+    def read(self, start_month=None, end_month=None):
+        """
+        Read the schedules of a range of months.
+
+        Parameters:
+            start_month (str): First month to read ('YYYY-MM'). Defaults to the first month stored.
+            end_month (str): Last month to read ('YYYY-MM'). Defaults to the last month stored.
+
+        Returns:
+            pandas.DataFrame: The schedules, with the same columns as the old CSV file.
+        """
+        with self._lock:
+            frames = [self._read_month(month) for month in self.months()
+                      if (start_month is None or month >= start_month)
+                      and (end_month is None or month <= end_month)]
+        frames = [frame for frame in frames if frame is not None]
+        if not frames:
+            return pd.DataFrame(columns=schedule_columns)
+        return pd.concat(frames, ignore_index=True)[schedule_columns]
+
+    def append(self, schedules):
+        """
+        Store new schedules.
+
+        Parameters:
+            schedules (list or pandas.DataFrame): Schedules with the CSV columns.
+        """
+        self._write_deltas(pd.DataFrame(schedules))
+
+    def update(self, schedules, expected=None):
+        """
+        Store a new version of existing schedules, e.g. after a status change.
+
+        Only the given rows are written; the drop-off date of a schedule must not change.
+
+        Parameters:
+            schedules (list or pandas.DataFrame): Schedules with the CSV columns.
+            expected (dict): Schedule ID mapped to {column: value} the edit started from. A
+                schedule whose stored values differ (changed by another session since) is left
+                alone and reported as a conflict. Defaults to writing every schedule.
+
+        Returns:
+            dict: 'updated' and 'conflicts', each a list of schedule IDs.
+        """
+        rows = pd.DataFrame(schedules)
+        if not expected:
+            self._write_deltas(rows)
+            return {"updated": rows["ID"].tolist(), "conflicts": []}
+        with self._exclusive():
+            # Read again under the lock, so no other write slips between the check and the write
+            stored = [self._read_month(month) for month in rows["Drop-off Date"].map(_month).unique()]
+            stored = pd.concat([frame for frame in stored if frame is not None] or [pd.DataFrame(columns=["ID"])])
+            stored = stored.set_index("ID")
+            conflicts = [schedule_id for schedule_id in rows["ID"]
+                         if schedule_id not in stored.index
+                         or any(stored.at[schedule_id, column] != value
+                                for column, value in expected.get(schedule_id, {}).items())]
+            rows = rows[~rows["ID"].isin(conflicts)]
+            self._write_deltas(rows)
+        return {"updated": rows["ID"].tolist(), "conflicts": conflicts}
+
+    def compact(self, month):
+        """Fold the delta files of a month into its base file."""
+        # Exclusive across processes: a base written from a stale read would drop what another
+        # process compacted in the meantime
+        with self._exclusive():
+            files = self._files(month)
+            if len(files) <= 1:
+                return
+            rows = self._read_month(month)
+            directory = self._partition(month)
+            temporary = os.path.join(directory, f".base-{uuid.uuid4().hex[:8]}.parquet.tmp")
+            pq.write_table(pa.Table.from_pandas(rows, schema=schedule_schema, preserve_index=False), temporary)
+            os.replace(temporary, os.path.join(directory, "base.parquet"))
+            for path in files:
+                if not path.endswith("base.parquet"):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        # Removed by hand, or by a version without the lock file
+                        pass
+
+    def _compact_all(self, max_deltas):
+        for month in self.months():
+            if self._stop.is_set():
+                return
+            if len(self._files(month)) > max_deltas:
+                self.compact(month)
+
+    def start_compactor(self, interval=60.0, max_deltas=20):
+        """
+        Compact, in a background thread, every month with more than `max_deltas` files.
+
+        Parameters:
+            interval (float): Seconds between two passes.
+            max_deltas (int): Files a month may have before it is compacted.
+        """
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self._compact_all(max_deltas)
+                except Exception:
+                    # The deltas are still there and readable; the next pass tries again
+                    logger.exception("Compaction of the schedule partitions failed")
+
+        self._stop.clear()
+        self._compactor = threading.Thread(target=run, name="schedule-compactor", daemon=True)
+        self._compactor.start()
+
+    def stop_compactor(self):
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+    def _meta_path(self):
+        return os.path.join(self.root, "meta.json")
+
+    def _read_meta(self):
+        if not os.path.exists(self._meta_path()):
+            return {"next_id": 1}
+        with open(self._meta_path()) as file:
+            return json.load(file)
+
+    def _write_meta(self, meta):
+        temporary = self._meta_path() + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump(meta, file)
+        os.replace(temporary, self._meta_path())
+
+    def _update_next_id(self, ids):
+        # Keep the counter ahead of every ID written, including the ones imported from the CSV file
+        numbers = [number for number in map(parse_schedule_id, ids) if number is not None]
+        if not numbers:
+            return
+        with self._exclusive():
+            meta = self._read_meta()
+            if max(numbers) >= meta["next_id"]:
+                meta["next_id"] = max(numbers) + 1
+                self._write_meta(meta)
+
+    def next_id(self):
+        """Reserve and return the ID of a new schedule without reading any partition."""
+        with self._exclusive():
+            meta = self._read_meta()
+            number = meta["next_id"]
+            meta["next_id"] = number + 1
+            self._write_meta(meta)
+        return format_schedule_id(number)
@@ -0,0 +1,225 @@
+import pandas as pd
+
+import rules
+from capacity import DayBook
+
+SUGGESTION_COLUMNS = ["ID", "Distribution_Center", "Dropoff_Date", "Load_Type", "Requested_Time",
+                      "Dropoff_Time", "Finishing_Time", "Wait_Minutes", "Accepted"]
+
+
+def _label(minute):
+    return f"{minute // 60 % 24:02d}:{minute % 60:02d}"
+
+
+class DayPlan:
+    """
+    Dock plan of one distribution center on one day.
+
+    Starts from the bookings that cannot move and places requested unloads on top of them,
+    at start times on a grid of `step_minutes` from the opening time, without going over the
+    daily limit or the number of docks.
+
+    Parameters:
+        opening (int): First allowed start, in minutes since midnight.
+        closing (int): Last allowed start, in minutes since midnight.
+        capacity (int): Bookings allowed on the day, counting the fixed ones.
+        docks (int): Unloads allowed at the same time.
+        step_minutes (int): Distance between two candidate start times.
+    """
+
+    def __init__(self, opening, closing, capacity, docks, step_minutes=30):
+        self.opening = opening
+        self.closing = closing
+        self.capacity = capacity
+        self.docks = docks
+        self.step_minutes = step_minutes
+        self.book = DayBook()
+
+    def add(self, start, duration):
+        self.book.add(start, start + duration)
+
+    def remove(self, start, duration):
+        self.book.remove(start, start + duration)
+
+    def full(self):
+        return self.book.count >= self.capacity
+
+    def starts(self, arrival, duration):
+        """Yield the free start times at or after `arrival`, earliest first."""
+        steps = max(0, -(-(arrival - self.opening) // self.step_minutes))
+        for start in range(self.opening + steps * self.step_minutes, self.closing + 1, self.step_minutes):
+            if duration == 0 or self.book.peak_occupancy(start, start + duration) < self.docks:
+                yield start
+
+
+def _greedy(plan, requests):
+    """
+    Place the requests in order of arrival (shortest unload first on ties), each at its
+    earliest free start. Returns the start of each request, or None when it does not fit.
+    """
+    placed = [None] * len(requests)
+    for number in sorted(range(len(requests)), key=lambda n: (requests[n][0], requests[n][1])):
+        arrival, duration = requests[number]
+        if plan.full():
+            break
+        start = next(plan.starts(arrival, duration), None)
+        if start is not None:
+            plan.add(start, duration)
+            placed[number] = start
+    return placed
+
+
+def _exact(plan, requests, initial, max_nodes):
+    """
+    Search every placement of the requests (each one at any free start, or left out) for the one
+    with the most bookings accepted and then the least waiting, starting from the `initial` solution.
+
+    Returns:
+        tuple: The best placement found and whether the search finished within `max_nodes`.
+    """
+    order = sorted(range(len(requests)), key=lambda n: requests[n])
+
+    def score(placed):
+        accepted = [n for n, start in enumerate(placed) if start is not None]
+        return len(accepted), sum(placed[n] - requests[n][0] for n in accepted)
+
+    best = list(initial)
+    best_accepted, best_wait = score(best)
+    current = [None] * len(requests)
+    nodes = 0
+
+    def search(position, accepted, wait):
+        nonlocal best, best_accepted, best_wait, nodes
+        nodes += 1
+        if nodes > max_nodes:
+            return
+        remaining = len(order) - position
+        room = plan.capacity - plan.book.count
+        # Not enough requests left to beat the best, or as many but already waiting longer
+        reachable = accepted + min(remaining, room)
+        if reachable < best_accepted or (reachable == best_accepted and wait >= best_wait):
+            return
+        if remaining == 0:
+            best, best_accepted, best_wait = list(current), accepted, wait
+            return
+        number = order[position]
+        arrival, duration = requests[number]
+        if room > 0:
+            for start in list(plan.starts(arrival, duration)):
+                reachable = accepted + 1 + min(remaining - 1, room - 1)
+                if reachable < best_accepted or (reachable == best_accepted and wait + start - arrival >= best_wait):
+                    break  # Later starts only wait longer
+                plan.add(start, duration)
+                current[number] = start
+                search(position + 1, accepted + 1, wait + start - arrival)
+                plan.remove(start, duration)
+                current[number] = None
+        search(position + 1, accepted, wait)
+
+    search(0, 0, 0)
+    return best, nodes <= max_nodes
+
+
+def plan_day(requests, fixed=(), opening=420, closing=900, capacity=10, docks=2, step_minutes=30,
+             exact=None, exact_limit=8, max_nodes=200_000):
+    """
+    Choose start times for the requested unloads of one center on one day.
+
+    Parameters:
+        requests (list): (arrival minute, unload minutes) of each request. A truck cannot start
+            before it arrives; the time between arrival and start is its wait.
+        fixed (list): (start minute, unload minutes) of the bookings that cannot move.
+        opening, closing, capacity, docks, step_minutes: See `DayPlan`.
+        exact (bool): Search for the best plan instead of using the greedy heuristic. Defaults to
+            searching when there are at most `exact_limit` requests.
+        exact_limit (int): Largest number of requests searched exactly by default.
+        max_nodes (int): Upper bound on the placements tried by the exact search; past it the best
+            plan found so far is returned.
+
+    Returns:
+        tuple: The start minute of each request (None when it is not accepted) and whether the plan
+            is known to be optimal.
+    """
+    plan = DayPlan(opening, closing, capacity, docks, step_minutes)
+    for start, duration in fixed:
+        plan.add(start, duration)
+    placed = _greedy(plan, requests)
+    if exact is None:
+        exact = len(requests) <= exact_limit
+    if not exact:
+        return placed, False
+
+    for number, start in enumerate(placed):
+        if start is not None:
+            plan.remove(start, requests[number][1])
+    return _exact(plan, requests, placed, max_nodes)
+
+
+def suggest_schedule(bookings, requests, max_schedules=None, max_simultaneous=None, minimum_time=None,
+                     maximum_time=None, step_minutes=30, exact=None, exact_limit=8):
+    """
+    Suggest start times for requested bookings, per distribution center and day.
+
+    Active bookings (see `rules.active_statuses`) keep their time; every request gets the start that,
+    together with the other requests of its day, accepts the most bookings and then makes trucks
+    wait the least after their requested time.
+
+    Parameters:
+        bookings (pandas.DataFrame): Existing schedules with the Schedules table columns.
+        requests (pandas.DataFrame): Requested bookings with the columns 'ID', 'Distribution_Center',
+            'Dropoff_Date', 'Dropoff_Time' (the requested arrival) and 'Load_Type'.
+        max_schedules, max_simultaneous, minimum_time, maximum_time: Rules of the centers. Default to
+            the ones in `rules`.
+        step_minutes (int): Distance between two candidate start times.
+        exact (bool): See `plan_day`.
+        exact_limit (int): See `plan_day`.
+
+    Returns:
+        pandas.DataFrame: One row per request, in the order given, with the `SUGGESTION_COLUMNS`.
+            Times are 'HH:MM'; 'Dropoff_Time', 'Finishing_Time' and 'Wait_Minutes' are empty for
+            requests that do not fit.
+    """
+    max_schedules = max_schedules if max_schedules is not None else rules.max_schedules
+    max_simultaneous = max_simultaneous if max_simultaneous is not None else rules.max_simulatenous
+    minimum_time = minimum_time if minimum_time is not None else rules.minimum_time
+    maximum_time = maximum_time if maximum_time is not None else rules.maximum_time
+
+    active = bookings[bookings["Status"].isin(rules.active_statuses)]
+    fixed = {}
+    for center, date, start_time, load_type in active[
+            ["Distribution_Center", "Dropoff_Date", "Dropoff_Time", "Load_Type"]].itertuples(index=False):
+        fixed.setdefault((center, rules.to_date(date)), []).append(
+            (rules.to_minutes(start_time), rules.duration_minutes(load_type)))
+
+    requested = requests.reset_index(drop=True)
+    groups = {}
+    for number, (center, date, start_time, load_type) in enumerate(requested[
+            ["Distribution_Center", "Dropoff_Date", "Dropoff_Time", "Load_Type"]].itertuples(index=False)):
+        groups.setdefault((center, rules.to_date(date)), []).append(
+            (number, rules.to_minutes(start_time), rules.duration_minutes(load_type)))
+
+    starts = [None] * len(requested)
+    for (center, date), members in groups.items():
+        placed, _ = plan_day(
+            [(arrival, duration) for _, arrival, duration in members], fixed.get((center, date), []),
+            opening=rules.to_minutes(minimum_time[center]), closing=rules.to_minutes(maximum_time[center]),
+            capacity=max_schedules[center], docks=max_simultaneous, step_minutes=step_minutes,
+            exact=exact, exact_limit=exact_limit,
+        )
+        for (number, _, _), start in zip(members, placed):
+            starts[number] = start
+
+    arrivals = [rules.to_minutes(value) for value in requested["Dropoff_Time"]]
+    durations = [rules.duration_minutes(value) for value in requested["Load_Type"]]
+    return pd.DataFrame({
+        "ID": requested["ID"],
+        "Distribution_Center": requested["Distribution_Center"],
+        "Dropoff_Date": [rules.to_date(value) for value in requested["Dropoff_Date"]],
+        "Load_Type": requested["Load_Type"],
+        "Requested_Time": [_label(arrival) for arrival in arrivals],
+        "Dropoff_Time": [None if start is None else _label(start) for start in starts],
+        "Finishing_Time": [None if start is None else _label(start + duration)
+                           for start, duration in zip(starts, durations)],
+        "Wait_Minutes": [None if start is None else start - arrival for start, arrival in zip(starts, arrivals)],
+        "Accepted": pd.Series([start is not None for start in starts], dtype=bool),
+    }, columns=SUGGESTION_COLUMNS)
@@ -0,0 +1,286 @@
+import contextlib
+import datetime
+import json
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from pipefy import PIPEFY_URL, create_pipefy_card, get_http_session
+
+logger = logging.getLogger(__name__)
+
+# Local SQLite file that holds the cards waiting to be sent to Pipefy
+OUTBOX_PATH = "pipefy_outbox.sqlite3"
+
+# Status of an outbox entry
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+
+def _now():
+    return datetime.datetime.now()
+
+
+def _is_retryable(result):
+    """
+    Decide whether a failed Pipefy call should be tried again.
+
+    Network errors, rate limiting (429) and server errors (5xx) are temporary.
+    Any other 4xx means the request itself is wrong, so retrying would not help.
+    """
+    status_code = result.get("status_code")
+    return status_code is None or status_code == 429 or status_code >= 500
+
+
+class PipefyOutbox:
+    """
+    Persistent queue of Pipefy cards delivered by a background thread.
+
+    The submit path only writes the card to a local SQLite file (`enqueue`), which takes
+    a few milliseconds and never touches the network. A worker thread picks up the pending
+    entries and sends them over the shared keep-alive session, with at most `max_workers`
+    requests in flight, exponential backoff between attempts and the outcome stored per entry.
+    Entries survive restarts: anything left in 'sending' by a crashed process goes back to 'pending'.
+
+    Parameters:
+        api_token (str): Pipefy API token.
+        pipe_id (str): ID of the pipe where the cards are created.
+        path (str): Path of the SQLite file used as the outbox.
+        url (str): GraphQL endpoint. Point it to a local stub server when testing.
+        max_workers (int): Maximum number of cards sent at the same time.
+        max_attempts (int): Attempts before an entry is marked as 'failed'.
+        base_delay (float): Seconds to wait before the first retry. Doubles on every attempt.
+        max_delay (float): Upper bound for the wait between retries, in seconds.
+        poll_interval (float): Seconds the worker sleeps when there is nothing to send.
+    """
+
+    def __init__(self, api_token, pipe_id, path=OUTBOX_PATH, url=PIPEFY_URL, max_workers=4,
+                 max_attempts=5, base_delay=2.0, max_delay=300.0, poll_interval=1.0):
+        self.api_token = api_token
+        self.pipe_id = pipe_id
+        self.path = path
+        self.url = url
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+
+        self._http_session = get_http_session(pool_size=max_workers)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._create_table()
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # Autocommit connection, closed on exit; transactions are opened explicitly where needed
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _create_table(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS Outbox (
+                    Outbox_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Schedule_ID TEXT,
+                    Title TEXT NOT NULL,
+                    Fields TEXT NOT NULL,
+                    Status TEXT NOT NULL,
+                    Attempts INTEGER NOT NULL DEFAULT 0,
+                    Next_Attempt_At TEXT NOT NULL,
+                    Last_Error TEXT,
+                    Card_ID TEXT,
+                    Created_At TEXT NOT NULL,
+                    Updated_At TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS Outbox_Due ON Outbox (Status, Next_Attempt_At)")
+
+    def enqueue(self, title, fields, schedule_id=None):
+        """
+        Store a card to be created in Pipefy and wake up the worker.
+
+        Parameters:
+            title (str): Card title.
+            fields (dict): Pipefy field IDs mapped to their values.
+            schedule_id (str): ID of the schedule the card belongs to.
+
+        Returns:
+            int: ID of the outbox entry, usable with `get`.
+        """
+        now = _now().isoformat(sep=" ")
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """
+                INSERT INTO Outbox (Schedule_ID, Title, Fields, Status, Next_Attempt_At, Created_At, Updated_At)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (schedule_id, title, json.dumps(fields), PENDING, now, now, now)
+            )
+            outbox_id = cursor.lastrowid
+        self._wakeup.set()
+        return outbox_id
+
+    def enqueue_many(self, cards):
+        """
+        Store many cards in a single transaction, e.g. after a bulk import.
+
+        Parameters:
+            cards (iterable): Tuples of (title, fields, schedule_id).
+
+        Returns:
+            int: Number of cards stored.
+        """
+        now = _now().isoformat(sep=" ")
+        rows = [(schedule_id, title, json.dumps(fields), PENDING, now, now, now)
+                for title, fields, schedule_id in cards]
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                """
+                INSERT INTO Outbox (Schedule_ID, Title, Fields, Status, Next_Attempt_At, Created_At, Updated_At)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows
+            )
+            conn.execute("COMMIT")
+        self._wakeup.set()
+        return len(rows)
+
+    def get(self, outbox_id):
+        """Return the outbox entry as a dict, or None if it does not exist."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM Outbox WHERE Outbox_ID = ?", (outbox_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def counts(self):
+        """Return the number of entries per status."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT Status, COUNT(*) FROM Outbox GROUP BY Status").fetchall()
+        return {status: count for status, count in rows}
+
+    def waiting_schedule_ids(self):
+        """Return the IDs of the schedules whose card is still waiting to be sent."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT Schedule_ID FROM Outbox WHERE Status IN (?, ?) AND Schedule_ID IS NOT NULL",
+                (PENDING, SENDING)
+            ).fetchall()
+        return {schedule_id for schedule_id, in rows}
+
+    def _claim_due(self):
+        # Atomically move up to `max_workers` due entries to 'sending'
+        now = _now().isoformat(sep=" ")
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                """
+                SELECT * FROM Outbox
+                WHERE Status = ? AND Next_Attempt_At <= ?
+                ORDER BY Next_Attempt_At, Outbox_ID
+                LIMIT ?
+                """,
+                (PENDING, now, self.max_workers)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE Outbox SET Status = ?, Updated_At = ? WHERE Outbox_ID = ?",
+                [(SENDING, now, row["Outbox_ID"]) for row in rows]
+            )
+            conn.execute("COMMIT")
+        return [dict(row) for row in rows]
+
+    def _deliver(self, entry):
+        try:
+            content = {
+                'api_token': self.api_token,
+                'pipe_id': self.pipe_id,
+                'title': entry["Title"],
+                'fields': json.loads(entry["Fields"])
+            }
+            result = create_pipefy_card(content, session=self._http_session, url=self.url)
+        except Exception as e:
+            # An unexpected answer or a bad entry must not stop the worker nor leave the entry in 'sending'
+            logger.exception("Pipefy card of outbox entry %s could not be sent", entry["Outbox_ID"])
+            result = {"success": False, "status_code": None, "error": f"Unexpected error: {e}"}
+
+        attempts = entry["Attempts"] + 1
+        now = _now()
+        if result["success"]:
+            status, next_attempt_at, error = SENT, now, None
+        elif _is_retryable(result) and attempts < self.max_attempts:
+            delay = min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+            status, next_attempt_at, error = PENDING, now + datetime.timedelta(seconds=delay), result["error"]
+        else:
+            status, next_attempt_at, error = FAILED, now, result["error"]
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                UPDATE Outbox
+                SET Status = ?, Attempts = ?, Next_Attempt_At = ?, Last_Error = ?, Card_ID = ?, Updated_At = ?
+                WHERE Outbox_ID = ?
+                """,
+                (status, attempts, next_attempt_at.isoformat(sep=" "),
+                 None if error is None else str(error), result.get("card_id"),
+                 now.isoformat(sep=" "), entry["Outbox_ID"])
+            )
+        return status
+
+    def process_due(self):
+        """
+        Send every entry that is due right now and wait for the results.
+
+        Used by the worker thread, but can also be called directly (e.g. from a script) to drain the outbox.
+
+        Returns:
+            int: Number of entries processed.
+        """
+        processed = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while not self._stop.is_set():
+                entries = self._claim_due()
+                if not entries:
+                    break
+                list(executor.map(self._deliver, entries))
+                processed += len(entries)
+        return processed
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.process_due()
+            except Exception:
+                # E.g. the outbox file locked or unreadable for a moment; try again on the next poll
+                logger.exception("Pipefy outbox delivery failed")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def start(self):
+        """Start the background worker. Entries interrupted by a previous crash are sent again."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE Outbox SET Status = ?, Updated_At = ? WHERE Status = ?",
+                (PENDING, _now().isoformat(sep=" "), SENDING)
+            )
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="pipefy-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Ask the worker to stop after the batch in flight and wait for it."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
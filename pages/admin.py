@@ -0,0 +1,33 @@
+import hmac
+
+import pandas as pd
+import streamlit as st
+from tracing import tracer
+
+st.set_page_config(page_title="Métricas", page_icon="📈")
+st.title("📈 Métricas da aplicação")
+
+# Only for administrators: the password is kept in the [admin] secrets
+password = st.text_input("Senha de administrador", type="password")
+if not password or not hmac.compare_digest(password, st.secrets.get("admin", {}).get("password", "")):
+    st.stop()
+
+snapshot = tracer.snapshot()
+
+st.header("Tempo por etapa")
+st.write("Percentis das últimas execuções de cada etapa, em milissegundos.")
+phases = pd.DataFrame.from_dict(snapshot["phases"], orient="index")
+st.dataframe(phases.round(2), use_container_width=True)
+
+col_counters, col_gauges = st.columns(2)
+col_counters.subheader("Contadores")
+col_counters.dataframe(pd.DataFrame(snapshot["counters"]), use_container_width=True, hide_index=True)
+col_gauges.subheader("Pool do banco de dados")
+col_gauges.dataframe(pd.DataFrame(snapshot["gauges"].items(), columns=["Gauge", "Valor"]),
+                     use_container_width=True, hide_index=True)
+
+with st.expander("Formato Prometheus"):
+    st.code(tracer.prometheus_text(), language="text")
+
+if st.button("Atualizar"):
+    st.rerun()
@@ -0,0 +1,139 @@
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubPipefyServer:
+    """
+    Local stand-in for the Pipefy GraphQL API, for benchmarks and offline checks.
+
+    Answers every `createCard` mutation with a new card ID and keeps the cards it created in
+    `cards`; `allCards` queries page through them. Use it as a context manager and point the
+    code to `url`:
+
+        with StubPipefyServer() as stub:
+            create_pipefy_card(content, url=stub.url)
+
+    Parameters:
+        latency (float): Seconds to wait before answering, to mimic the network.
+        fail_every (int): Answer every n-th request with HTTP 503 (0 never fails).
+        rate_limit (float): Requests accepted per second; the others get HTTP 429 with a
+            Retry-After header, like the real API. None accepts everything.
+    """
+
+    def __init__(self, latency=0.0, fail_every=0, rate_limit=None):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.rate_limit = rate_limit
+        self.cards = {}
+        self.requests = 0
+        self.rate_limited = 0
+        self._allowance = rate_limit
+        self._last_request = time.monotonic()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/graphql"
+
+    def _create_cards(self, query, variables):
+        # One entry per createCard in the document (a single mutation or many aliased ones)
+        aliases = re.findall(r"(\w+)\s*:\s*createCard", query) or ["createCard"]
+        data = {}
+        for alias in aliases:
+            prefix = "" if alias == "createCard" else f"{alias}_"
+            title = variables.get(f"{prefix}title", variables.get("title"))
+            fields = variables.get(f"{prefix}fields", variables.get("fields")) or []
+            with self._lock:
+                card_id = str(next(self._ids))
+                self.cards[card_id] = {"title": title, "fields": {
+                    field["field_id"]: field["field_value"] for field in fields}}
+            data[alias] = {"card": {"id": card_id, "title": title}}
+        return data
+
+    def _list_cards(self, variables):
+        # Cursors are card IDs: a page starts after the card given in 'after'
+        first = min(variables.get("first") or 50, 50)
+        after = int(variables.get("after") or 0)
+        with self._lock:
+            ids = sorted(int(card_id) for card_id in self.cards if int(card_id) > after)
+            page = [(str(card_id), self.cards[str(card_id)]) for card_id in ids[:first]]
+        edges = [{"node": {"id": card_id, "title": card["title"],
+                           "fields": [{"field": {"id": field_id}, "value": value}
+                                      for field_id, value in card["fields"].items()]}}
+                 for card_id, card in page]
+        return {"allCards": {
+            "pageInfo": {"hasNextPage": len(ids) > first, "endCursor": page[-1][0] if page else None},
+            "edges": edges,
+        }}
+
+    def _over_rate_limit(self):
+        # Token bucket holding up to one second of requests
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(self.rate_limit, self._allowance + (now - self._last_request) * self.rate_limit)
+            self._last_request = now
+            if self._allowance < 1:
+                self.rate_limited += 1
+                return True
+            self._allowance -= 1
+            return False
+
+    def handle(self, body):
+        """Return the HTTP status and JSON answer for a GraphQL request body."""
+        if self.rate_limit and self._over_rate_limit():
+            return 429, {"errors": [{"message": "Too many requests"}]}
+        with self._lock:
+            self.requests += 1
+            number = self.requests
+        if self.fail_every and number % self.fail_every == 0:
+            return 503, {"errors": [{"message": "Service unavailable"}]}
+        query = body.get("query", "")
+        variables = body.get("variables") or {}
+        if "createCard" in query:
+            return 200, {"data": self._create_cards(query, variables)}
+        if "allCards" in query:
+            return 200, {"data": self._list_cards(variables)}
+        return 400, {"errors": [{"message": "Unsupported query"}]}
+
+    def __enter__(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep connections open, like the real API, so pooled sessions are measured properly
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if stub.latency:
+                    threading.Event().wait(stub.latency)
+                status, answer = stub.handle(body)
+                payload = json.dumps(answer).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                if status == 429:
+                    self.send_header("Retry-After", "1")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
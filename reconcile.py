@@ -0,0 +1,321 @@
+"""
+Create the Pipefy cards of the schedules that have none.
+
+A schedule whose card could not be delivered exists in the database but not in Pipefy. This job
+lists the cards of the pipe, matches them to schedules through the 'id' field sent with every
+card, and creates the missing ones in batches of aliased createCard mutations, with fewer
+requests in flight whenever Pipefy answers 429. Progress is saved to a checkpoint file, so an
+interrupted run starts again where it stopped:
+
+    python reconcile.py --since 2026-01-01
+    python reconcile.py --db-url sqlite:///local.db --url http://127.0.0.1:8000/graphql --dry-run
+
+The database and the API token are read from .streamlit/secrets.toml unless given as options.
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from sqlalchemy import text
+
+from database import Database
+from outbox import OUTBOX_PATH, PipefyOutbox, _is_retryable
+from pipefy import PIPEFY_URL, create_pipefy_cards, get_http_session, list_pipefy_cards, schedule_card
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_PATH = "reconcile_checkpoint.json"
+
+# Columns of the Schedules table needed to build a card
+card_columns = ["ID", "Supplier_Name", "Dropoff_Date", "Distribution_Center", "Pallet_Number",
+                "Total_Weight", "Status"]
+
+
+class AdaptiveLimit:
+    """
+    Number of requests allowed in flight, adjusted to the answers of Pipefy.
+
+    Starts at `max_limit`. A rate-limited answer halves the limit and pauses every sender for the
+    Retry-After delay; after as many successful requests as the current limit, it grows by one again.
+    """
+
+    def __init__(self, max_limit):
+        self.max_limit = max_limit
+        self.limit = max_limit
+        self._in_flight = 0
+        self._successes = 0
+        self._paused_until = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Wait for a free place and take it."""
+        with self._condition:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause <= 0 and self._in_flight < self.limit:
+                    self._in_flight += 1
+                    return
+                self._condition.wait(pause if pause > 0 else None)
+
+    def release(self, rate_limited=False, retry_after=None):
+        """Give the place back, telling whether the request was rate limited."""
+        with self._condition:
+            self._in_flight -= 1
+            if rate_limited:
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+                self._paused_until = max(self._paused_until, time.monotonic() + (retry_after or 1))
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+
+class Checkpoint:
+    """
+    Progress of a reconciliation, saved as JSON after every page of cards read and every batch sent.
+
+    Holds the schedules known to have a card (found in Pipefy or created by the run) and the
+    cursor of the card listing. A checkpoint of another pipe is ignored.
+    """
+
+    def __init__(self, path, pipe_id):
+        self.path = path
+        self._lock = threading.Lock()
+        self.state = {"pipe_id": pipe_id, "listing_cursor": None, "listing_done": False, "cards": {}}
+        if path is not None and os.path.exists(path):
+            with open(path) as file:
+                saved = json.load(file)
+            if saved.get("pipe_id") == pipe_id:
+                self.state = saved
+
+    def add_cards(self, cards):
+        """Record schedules that have a card, as a dict of schedule ID to card ID."""
+        with self._lock:
+            self.state["cards"].update(cards)
+
+    def save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            # Written next to the file and renamed, so an interruption never leaves it half written
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w") as file:
+                json.dump(self.state, file)
+            os.replace(temporary, self.path)
+
+    def remove(self):
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def card_schedule_id(card):
+    """Return the schedule ID of a Pipefy card: its 'id' field, or the ID in the title."""
+    schedule_id = card["fields"].get("id")
+    if schedule_id:
+        return str(schedule_id)
+    if card["title"] and card["title"].startswith("Agendamento: "):
+        return card["title"][len("Agendamento: "):]
+    return None
+
+
+def load_schedules(database, since=None):
+    """Read the schedules that should have a card, optionally only those with a drop-off on or after `since`."""
+    query = f"SELECT {', '.join(card_columns)} FROM Schedules"
+    params = {}
+    if since is not None:
+        query += " WHERE Dropoff_Date >= :since"
+        params["since"] = since
+    with database.connect() as conn:
+        return pd.read_sql(text(query + " ORDER BY ID"), conn, params=params)
+
+
+class PipefyReconciler:
+    """
+    Finds the schedules without a Pipefy card and creates them.
+
+    Parameters:
+        api_token (str): Pipefy API token.
+        pipe_id (str): ID of the pipe of the cards.
+        url (str): GraphQL endpoint. Point it to a local stub server when testing.
+        batch_size (int): Cards created per request.
+        max_workers (int): Maximum number of requests in flight; lowered while Pipefy rate limits.
+        checkpoint_path (str): JSON file with the progress of the run, or None to keep it in memory.
+        max_attempts (int): Attempts per batch before its cards are reported as failed.
+        base_delay (float): Seconds to wait before retrying a failed batch. Doubles on every attempt.
+        max_delay (float): Upper bound for the wait between retries, in seconds.
+    """
+
+    def __init__(self, api_token, pipe_id, url=PIPEFY_URL, batch_size=20, max_workers=4,
+                 checkpoint_path=CHECKPOINT_PATH, max_attempts=5, base_delay=1.0, max_delay=60.0):
+        self.api_token = api_token
+        self.pipe_id = pipe_id
+        self.url = url
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.checkpoint = Checkpoint(checkpoint_path, pipe_id)
+        self.limit = AdaptiveLimit(max_workers)
+        self._http_session = get_http_session(pool_size=max_workers)
+
+    def find_cards(self):
+        """
+        Read every card of the pipe, resuming from the checkpoint.
+
+        Returns:
+            dict: Schedule ID mapped to card ID, for every schedule known to have a card.
+        """
+        state = self.checkpoint.state
+        attempt = 1
+        while not state["listing_done"]:
+            pages = list_pipefy_cards(self.api_token, self.pipe_id, session=self._http_session, url=self.url,
+                                      after=state["listing_cursor"])
+            try:
+                for cards, cursor in pages:
+                    self.checkpoint.add_cards({card_schedule_id(card): card["id"] for card in cards
+                                               if card_schedule_id(card) is not None})
+                    state["listing_cursor"] = cursor
+                    state["listing_done"] = cursor is None
+                    self.checkpoint.save()
+            except RuntimeError:
+                # Start again from the last page read
+                if attempt >= self.max_attempts:
+                    raise
+                time.sleep(min(self.base_delay * 2 ** (attempt - 1), self.max_delay))
+                attempt += 1
+        return dict(state["cards"])
+
+    def _send_batch(self, schedules):
+        """Create the cards of a batch, retrying the temporary failures. Returns the failed schedule IDs."""
+        pending, failed = schedules, {}
+        for attempt in range(1, self.max_attempts + 1):
+            self.limit.acquire()
+            result = create_pipefy_cards(self.api_token, self.pipe_id,
+                                         [schedule_card(schedule) for schedule in pending],
+                                         session=self._http_session, url=self.url)
+            rate_limited = result["status_code"] == 429
+            self.limit.release(rate_limited, result["retry_after"])
+
+            created, retry = {}, []
+            for schedule, card in zip(pending, result["cards"]):
+                if card["success"]:
+                    created[schedule["ID"]] = card["card_id"]
+                elif _is_retryable(result) and attempt < self.max_attempts:
+                    retry.append(schedule)
+                else:
+                    failed[schedule["ID"]] = card["error"]
+            self.checkpoint.add_cards(created)
+            self.checkpoint.save()
+            if not retry:
+                break
+            pending = retry
+            if not rate_limited:  # A rate-limited answer already paused every sender
+                time.sleep(min(self.base_delay * 2 ** (attempt - 1), self.max_delay))
+        return failed
+
+    def create_cards(self, schedules):
+        """
+        Create the cards of `schedules` in batches of `batch_size`.
+
+        Parameters:
+            schedules (list): Rows of the Schedules table as dicts, with the `card_columns`.
+
+        Returns:
+            dict: Schedule ID mapped to the error of each card that could not be created.
+        """
+        batches = [schedules[start:start + self.batch_size] for start in range(0, len(schedules), self.batch_size)]
+        failed = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for batch_failed in executor.map(self._send_batch, batches):
+                failed.update(batch_failed)
+        return failed
+
+    def run(self, schedules, skip_ids=(), dry_run=False):
+        """
+        Create the missing cards of `schedules`.
+
+        Parameters:
+            schedules (pandas.DataFrame): Schedules that should have a card, with the `card_columns`.
+            skip_ids (iterable): Schedules to leave alone, e.g. those still waiting in the outbox.
+            dry_run (bool): Only count the missing cards.
+
+        Returns:
+            dict: Number of 'schedules', of those that already had a card ('with_card'), skipped,
+                'missing', 'created' and 'failed', plus the 'errors' per schedule ID.
+        """
+        with_card = self.find_cards()
+        skip_ids = set(skip_ids)
+        ids = schedules["ID"].astype(str)
+        has_card = ids.isin(with_card.keys())
+        skipped = ~has_card & ids.isin(skip_ids)
+        missing = schedules[~has_card & ~skipped].to_dict("records")
+        summary = {"schedules": len(schedules), "with_card": int(has_card.sum()), "skipped": int(skipped.sum()),
+                   "missing": len(missing), "created": 0, "failed": 0, "errors": {}}
+        logger.info("%d schedules, %d with a card, %d waiting in the outbox, %d missing",
+                    summary["schedules"], summary["with_card"], summary["skipped"], summary["missing"])
+        if dry_run or not missing:
+            return summary
+
+        errors = self.create_cards(missing)
+        summary.update(created=len(missing) - len(errors), failed=len(errors), errors=errors)
+        # Finished: the next run lists the cards again instead of trusting an old listing
+        self.checkpoint.remove()
+        return summary
+
+
+def read_secrets(path):
+    import tomllib
+
+    if not os.path.exists(path):
+        return {}
+    with open(path, "rb") as file:
+        return tomllib.load(file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--secrets", default=os.path.join(".streamlit", "secrets.toml"),
+                        help="Streamlit secrets with the [mysql] and [pipefy] sections")
+    parser.add_argument("--db-url", help="SQLAlchemy URL of the schedules database (default: from the secrets)")
+    parser.add_argument("--api-token", default=os.environ.get("PIPEFY_API_TOKEN"),
+                        help="Pipefy API token (default: $PIPEFY_API_TOKEN or the secrets)")
+    parser.add_argument("--pipe-id", default="305477886", help="Pipe of the schedule cards")
+    parser.add_argument("--url", default=PIPEFY_URL, help="GraphQL endpoint")
+    parser.add_argument("--since", help="Only schedules with a drop-off on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--batch-size", type=int, default=20, help="Cards created per request")
+    parser.add_argument("--workers", type=int, default=4, help="Maximum requests in flight")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH, help="Progress file used to resume a run")
+    parser.add_argument("--outbox", default=OUTBOX_PATH,
+                        help="Outbox of the app; schedules still waiting there are skipped")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the missing cards")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    secrets = read_secrets(args.secrets)
+    database = Database(args.db_url) if args.db_url else Database.from_config(secrets["mysql"])
+    api_token = args.api_token or secrets["pipefy"]["api_token"]
+    skip_ids = set()
+    if os.path.exists(args.outbox):
+        skip_ids = PipefyOutbox(api_token, args.pipe_id, path=args.outbox).waiting_schedule_ids()
+
+    started = time.perf_counter()
+    reconciler = PipefyReconciler(api_token, args.pipe_id, url=args.url, batch_size=args.batch_size,
+                                  max_workers=args.workers, checkpoint_path=args.checkpoint)
+    summary = reconciler.run(load_schedules(database, args.since), skip_ids=skip_ids, dry_run=args.dry_run)
+    for schedule_id, error in summary.pop("errors").items():
+        logger.warning("%s: %s", schedule_id, error)
+    logger.info("%s in %.1f s", json.dumps(summary), time.perf_counter() - started)
+    database.dispose()
+
+
+if __name__ == "__main__":
+    main()
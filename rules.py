@@ -0,0 +1,72 @@
+import datetime
+from datetime import time
+
+# Define the maximum number of schedules allowed per day
+max_schedules = {'CLAS': 10, 'JSL': 6, 'GPA': 7}
+
+# Define the maximum number of simultaneous schedules
+max_simulatenous = 2
+
+# Minimum Time
+minimum_time = {'CLAS': time(7, 0), 'JSL': time(13, 00), 'GPA': time(7, 0)}
+
+# Maximum Time
+maximum_time = {'CLAS': time(15, 0), 'JSL': time(20, 00), 'GPA': time(14, 0)}
+
+# Offloading duration for each load type
+offloading_duration = {
+    "Pallet Monoproduto": datetime.timedelta(minutes=30),
+    "Pallet Misto": datetime.timedelta(minutes=60),
+    "Estivado": datetime.timedelta(minutes=120)
+}
+
+# Statuses that take a slot of the distribution center
+active_statuses = ("Agendado", "Completo")
+
+
+def get_finishing_time(start_date, start_time, category):
+    start_datetime = datetime.datetime.combine(start_date, start_time)
+    # Default to zero timedelta if the category is not found
+    duration = offloading_duration.get(category, datetime.timedelta())
+    end_time = start_datetime + duration
+    return end_time.time()
+
+
+def to_date(value):
+    """
+    Convert a drop-off date as stored in MySQL, the CSV file or a form into a `datetime.date`.
+
+    Parameters:
+        value: A `date`, `datetime`, pandas Timestamp or 'YYYY-MM-DD' string.
+
+    Returns:
+        datetime.date: The converted date.
+    """
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+def to_minutes(value):
+    """
+    Convert a drop-off time into minutes since midnight.
+
+    Parameters:
+        value: A `time`, a `timedelta` (how MySQL TIME columns are read) or an 'HH:MM[:SS]' string.
+
+    Returns:
+        int: Minutes since midnight.
+    """
+    if isinstance(value, datetime.timedelta):
+        return int(value.total_seconds()) // 60
+    if isinstance(value, (datetime.time, datetime.datetime)):
+        return value.hour * 60 + value.minute
+    hours, minutes = str(value).split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def duration_minutes(category):
+    """Return the offloading duration of a load type in minutes."""
+    return int(offloading_duration.get(category, datetime.timedelta()).total_seconds()) // 60
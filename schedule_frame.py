@@ -0,0 +1,108 @@
+import pandas as pd
+
+import rules
+
+# Text is stored in Arrow buffers with NaN for missing values
+string_dtype = "string[pyarrow_numpy]" if int(pd.__version__.split(".")[0]) < 3 else "str"
+
+# Known values of the enum columns; other values found in the data are added after them
+enum_values = {
+    "Status": ["Agendado", "Completo", "Cancelado"],
+    "Distribution_Center": list(rules.max_schedules),
+    "Load_Type": list(rules.offloading_duration),
+}
+
+
+def enable_copy_on_write():
+    """
+    Make filtering a shared snapshot give views that are only copied when someone writes to them.
+
+    Always the case from pandas 3 on. On older versions this sets a process-wide pandas option,
+    so the apps call it once at start-up rather than it being a side effect of an import.
+    """
+    if int(pd.__version__.split(".")[0]) < 3:
+        pd.set_option("mode.copy_on_write", True)
+
+
+def to_datetimes(values):
+    """
+    Return the values as `datetime64`, like `pd.to_datetime`.
+
+    Columns that already are `datetime64` (the drop-off date of a compact snapshot) are returned
+    as they are: `pd.to_datetime` would convert them again, which costs more than the filter itself.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    return pd.to_datetime(values)
+
+
+def _time_label(value):
+    if pd.isnull(value):
+        return None
+    minutes = rules.to_minutes(value)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def compact_schedules(rows, columns=None):
+    """
+    Convert schedules to compact, typed columns, meant to be built once and shared read-only.
+
+    - Status, center and load type become categoricals (one byte per row instead of a string).
+    - The drop-off date becomes `datetime64`, so date filters compare numbers instead of strings.
+    - The drop-off time becomes a categorical of 'HH:MM' labels, parsed once per distinct time.
+    - Other text columns become Arrow strings and counts become 32-bit integers.
+
+    Parameters:
+        rows (pandas.DataFrame): Schedules as read from the database or the Parquet files.
+        columns (dict): Names used in `rows` mapped to the Schedules table names, for the columns
+            that are named differently (e.g. the CSV columns). Names are kept as they are in `rows`.
+
+    Returns:
+        pandas.DataFrame: The converted schedules.
+    """
+    names = {standard: name for name, standard in (columns or {}).items()}
+    typed = {}
+    for standard, values in enum_values.items():
+        name = names.get(standard, standard)
+        if name in rows:
+            extra = sorted(set(rows[name].dropna().unique().astype(str)) - set(values))
+            typed[name] = pd.Categorical(rows[name], categories=values + extra)
+
+    date = names.get("Dropoff_Date", "Dropoff_Date")
+    if date in rows:
+        typed[date] = pd.to_datetime(rows[date]).astype("datetime64[s]")
+
+    time = names.get("Dropoff_Time", "Dropoff_Time")
+    if time in rows:
+        labels = {value: _time_label(value) for value in rows[time].drop_duplicates()}
+        typed[time] = pd.Categorical(rows[time].map(labels))
+
+    for name in rows.columns:
+        if name in typed:
+            continue
+        column = rows[name]
+        if pd.api.types.is_integer_dtype(column) and (column.empty or column.abs().max() < 2 ** 31):
+            typed[name] = column.astype("int32")
+        elif pd.api.types.is_object_dtype(column) or pd.api.types.is_string_dtype(column):
+            typed[name] = column.astype(string_dtype)
+        else:
+            typed[name] = column
+    return pd.DataFrame(typed, index=rows.index)[list(rows.columns)]
+
+
+def concat_schedules(frames):
+    """
+    Concatenate compact schedules, keeping the categorical columns categorical.
+
+    Frames built at different times may know different categories (e.g. a new distribution
+    center); they are merged first, since pandas falls back to plain objects otherwise.
+    """
+    frames = [frame for frame in frames if frame is not None]
+    categorical = [name for name, dtype in frames[0].dtypes.items() if isinstance(dtype, pd.CategoricalDtype)]
+    for name in categorical:
+        categories = []
+        for frame in frames:
+            if isinstance(frame[name].dtype, pd.CategoricalDtype):
+                categories += [value for value in frame[name].cat.categories if value not in categories]
+        frames = [frame.assign(**{name: pd.Categorical(frame[name], categories=categories)}) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,116 @@
+import threading
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+ID_PREFIX = "SCHEDULE-"
+
+
+def format_schedule_id(number):
+    return f"{ID_PREFIX}{number}"
+
+
+def parse_schedule_id(schedule_id):
+    """Return the number of a 'SCHEDULE-<n>' ID, or None if the ID does not follow that format."""
+    try:
+        return int(str(schedule_id).split("-")[1])
+    except (IndexError, ValueError):
+        return None
+
+
+class ScheduleIdAllocator:
+    """
+    Hands out schedule IDs from a counter row in the database.
+
+    The counter lives in the Sequences table. Reserving numbers is a single
+    `UPDATE ... SET Next_Value = Next_Value + n` followed by a read inside the same
+    transaction: the update locks the row, so two sessions (or two processes) can never
+    get the same number, and the cost does not depend on how many schedules exist.
+
+    With `block_size` > 1 each process reserves numbers in blocks and hands them out from
+    memory, so only one in `block_size` IDs touches the database. Numbers reserved but not
+    used (e.g. when the process restarts) are skipped; IDs stay unique but may have gaps.
+
+    Parameters:
+        engine (sqlalchemy.Engine): Engine of the database holding the Schedules table.
+        name (str): Name of the counter row.
+        block_size (int): How many numbers to reserve at once.
+    """
+
+    def __init__(self, engine, name="Schedules", block_size=1):
+        self.engine = engine
+        self.name = name
+        self.block_size = block_size
+
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+        self._create_counter()
+
+    def _create_counter(self):
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS Sequences (
+                    Name VARCHAR(64) PRIMARY KEY,
+                    Next_Value BIGINT NOT NULL
+                )
+            """))
+            exists = conn.execute(text("SELECT 1 FROM Sequences WHERE Name = :name"), {"name": self.name}).first()
+        if exists is None:
+            self._seed()
+
+    def _seed(self):
+        # Start after the highest ID already used; only runs once, when the counter row is created
+        with self.engine.connect() as conn:
+            ids = conn.execute(text("SELECT ID FROM Schedules")).scalars()
+            numbers = [number for number in map(parse_schedule_id, ids) if number is not None]
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(
+                    text("INSERT INTO Sequences (Name, Next_Value) VALUES (:name, :next_value)"),
+                    {"name": self.name, "next_value": max(numbers, default=0) + 1}
+                )
+        except IntegrityError:
+            # Another process created the counter first
+            pass
+
+    def reserve(self, count):
+        """
+        Reserve `count` consecutive numbers in the database.
+
+        Returns:
+            range: The reserved numbers.
+        """
+        with self.engine.begin() as conn:
+            conn.execute(
+                text("UPDATE Sequences SET Next_Value = Next_Value + :count WHERE Name = :name"),
+                {"count": count, "name": self.name}
+            )
+            end = conn.execute(
+                text("SELECT Next_Value FROM Sequences WHERE Name = :name"), {"name": self.name}
+            ).scalar_one()
+        return range(end - count, end)
+
+    def next_id(self):
+        """Return a new, unused schedule ID."""
+        with self._lock:
+            if self._next < self._end:
+                number = self._next
+                self._next += 1
+                return format_schedule_id(number)
+        # Reserved without holding the lock, so other threads are not queued behind the database:
+        # the counter row lock orders concurrent reservations. The rest of the block is kept for
+        # the next calls, unless another thread refilled it first (its numbers become a gap)
+        numbers = self.reserve(self.block_size)
+        with self._lock:
+            if self._next >= self._end:
+                self._next, self._end = numbers.start + 1, numbers.stop
+        return format_schedule_id(numbers.start)
+
+    def allocate(self, count):
+        """
+        Return `count` new schedule IDs with a single database round trip, e.g. for a bulk import.
+        """
+        numbers = self.reserve(count)
+        return [format_schedule_id(number) for number in numbers]
+
@@ -0,0 +1,111 @@
+import pandas as pd
+from sqlalchemy import inspect, text
+
+# Indexes used by the schedules grid: filter by center and date range, filter by status
+schedule_indexes = {
+    "Schedules_Center_Date": ["Distribution_Center", "Dropoff_Date"],
+    "Schedules_Status": ["Status"],
+}
+
+
+def create_indexes(database):
+    """Create the indexes used by the schedules grid, if they do not exist yet."""
+    engine = getattr(database, "engine", database)
+    existing = {index["name"] for index in inspect(engine).get_indexes("Schedules")}
+    with database.begin() as conn:
+        for name, columns in schedule_indexes.items():
+            if name not in existing:
+                conn.execute(text(f"CREATE INDEX {name} ON Schedules ({', '.join(columns)})"))
+
+
+def _where(filters):
+    """
+    Build the WHERE clause of the grid filters.
+
+    Parameters:
+        filters (dict): Optional keys 'center', 'date_from', 'date_to', 'status' and 'supplier'
+            (prefix of the supplier name). Missing or None values are not filtered.
+    """
+    conditions, params = [], {}
+    if filters.get("center") is not None:
+        conditions.append("Distribution_Center = :center")
+        params["center"] = filters["center"]
+    if filters.get("date_from") is not None:
+        conditions.append("Dropoff_Date >= :date_from")
+        params["date_from"] = filters["date_from"]
+    if filters.get("date_to") is not None:
+        conditions.append("Dropoff_Date <= :date_to")
+        params["date_to"] = filters["date_to"]
+    if filters.get("status") is not None:
+        conditions.append("Status = :status")
+        params["status"] = filters["status"]
+    if filters.get("supplier"):
+        conditions.append("Supplier_Name LIKE :supplier")
+        params["supplier"] = filters["supplier"] + "%"
+    return conditions, params
+
+
+def fetch_page(database, filters, after=None, page_size=50):
+    """
+    Read one page of schedules, ordered by drop-off date and ID.
+
+    Uses keyset pagination: instead of an OFFSET, the next page starts right after the last row
+    of the previous one, so every page costs the same however deep the user goes.
+
+    Parameters:
+        database: Engine or `Database` of the schedules database.
+        filters (dict): See `_where`.
+        after (tuple): (Dropoff_Date, ID) of the last row of the previous page, or None for the first page.
+        page_size (int): Rows per page.
+
+    Returns:
+        tuple: The page as a DataFrame and the cursor of the next page (None on the last page).
+    """
+    conditions, params = _where(filters)
+    if after is not None:
+        conditions.append("(Dropoff_Date > :after_date OR (Dropoff_Date = :after_date AND ID > :after_id))")
+        params["after_date"], params["after_id"] = after
+    query = "SELECT * FROM Schedules"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY Dropoff_Date, ID LIMIT :limit"
+    params["limit"] = page_size + 1
+
+    with database.connect() as conn:
+        page = pd.read_sql(text(query), conn, params=params)
+    if len(page) <= page_size:
+        return page, None
+    page = page.iloc[:page_size]
+    last = page.iloc[-1]
+    return page, (last["Dropoff_Date"], last["ID"])
+
+
+def count_schedules(database, filters):
+    """Return how many schedules match the filters."""
+    conditions, params = _where(filters)
+    query = "SELECT COUNT(*) FROM Schedules"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    with database.connect() as conn:
+        return conn.execute(text(query), params).scalar_one()
+
+
+def distinct_centers(database):
+    """Return the distribution centers that have schedules, read from the (center, date) index."""
+    with database.connect() as conn:
+        return list(conn.execute(text(
+            "SELECT DISTINCT Distribution_Center FROM Schedules ORDER BY Distribution_Center"
+        )).scalars())
+
+
+def fetch_status_rows(database, filters):
+    """
+    Read the ID, center, drop-off date and status of the schedules matching the filters, e.g. to
+    seed `ScheduleStats` with the history the schedule store does not load.
+    """
+    conditions, params = _where(filters)
+    query = "SELECT ID, Distribution_Center, Dropoff_Date, Status FROM Schedules"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    with database.connect() as conn:
+        return pd.read_sql(text(query), conn, params=params)
@@ -0,0 +1,158 @@
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from schedule_frame import to_datetimes
+
+statuses = ["Agendado", "Completo", "Cancelado"]
+
+
+class ScheduleStats:
+    """
+    Number of schedules per (distribution center, month, status), kept up to date row by row.
+
+    Follows the schedule store (or any batch of rows) through `apply_rows`: each schedule is
+    counted once under its current key, and moves to another key when its status changes.
+    Schedules the store does not load (older than its window) are counted with `seed`.
+    Metrics and charts read the few aggregate rows instead of the whole schedules table.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._keys = {}
+        # Schedules counted by `seed`: a key number per ID, so a later change can move their count
+        self._seeded = pd.Series([], dtype="int32", index=pd.Index([], dtype=object))
+        self._seeded_keys = []
+
+    def seed(self, rows, columns=("ID", "Distribution_Center", "Dropoff_Date", "Status")):
+        """
+        Count schedules that are not followed row by row, e.g. the history older than the window of
+        the schedule store (see `schedule_queries.fetch_status_rows`).
+
+        Only a key number per schedule is kept instead of a dict entry, so a large history stays
+        small, while a schedule changed later (say, cancelled from the full-history grid) still
+        moves from its old key to its new one in `apply_rows`.
+
+        Parameters:
+            rows (pandas.DataFrame): The schedules.
+            columns (tuple): Names of the ID, center, drop-off date and status columns in `rows`.
+        """
+        if rows.empty:
+            return
+        months = to_datetimes(rows[columns[2]]).dt.to_period("M").astype(str)
+        codes, keys = pd.MultiIndex.from_arrays([rows[columns[1]], months, rows[columns[3]]]).factorize()
+        with self._lock:
+            offset = len(self._seeded_keys)
+            self._seeded_keys += list(keys)
+            for key, count in zip(keys, np.bincount(codes, minlength=len(keys))):
+                self._counts[key] += int(count)
+            seeded = pd.Series((codes + offset).astype("int32"), index=pd.Index(rows[columns[0]], dtype=object))
+            self._seeded = pd.concat([self._seeded, seeded]) if len(self._seeded) else seeded
+
+    def apply_rows(self, rows, removed_ids=(),
+                   columns=("ID", "Distribution_Center", "Dropoff_Date", "Status")):
+        """
+        Count new or changed schedules and forget removed ones.
+
+        Parameters:
+            rows (pandas.DataFrame): New or changed schedules.
+            removed_ids (iterable): IDs of schedules that no longer exist.
+            columns (tuple): Names of the ID, center, drop-off date and status columns in `rows`.
+        """
+        months = to_datetimes(rows[columns[2]]).dt.to_period("M").astype(str)
+        records = zip(rows[columns[0]], rows[columns[1]], months, rows[columns[3]])
+        removed_ids = list(removed_ids)
+        with self._lock:
+            self._forget_seeded(list(rows[columns[0]]) + removed_ids)
+            for schedule_id in removed_ids:
+                self._forget(schedule_id)
+            for schedule_id, center, month, status in records:
+                self._forget(schedule_id)
+                key = (center, month, status)
+                self._counts[key] += 1
+                self._keys[schedule_id] = key
+
+    def _decrement(self, key):
+        self._counts[key] -= 1
+        if self._counts[key] == 0:
+            del self._counts[key]
+
+    def _forget_seeded(self, ids):
+        # Seeded schedules seen again are followed row by row from now on
+        if not len(self._seeded):
+            return
+        found = self._seeded.index.isin(ids)
+        if not found.any():
+            return
+        for code in self._seeded[found]:
+            self._decrement(self._seeded_keys[code])
+        self._seeded = self._seeded[~found]
+
+    def _forget(self, schedule_id):
+        key = self._keys.pop(schedule_id, None)
+        if key is not None:
+            self._decrement(key)
+
+    def summary(self, center=None):
+        """
+        Return the aggregated counts.
+
+        Parameters:
+            center (str): Only count this distribution center. Defaults to every center.
+
+        Returns:
+            pandas.DataFrame: Columns 'Distribution_Center', 'Month', 'Status' and 'Count'.
+        """
+        with self._lock:
+            items = [(*key, count) for key, count in self._counts.items()
+                     if center is None or key[0] == center]
+        return pd.DataFrame(items, columns=["Distribution_Center", "Month", "Status", "Count"])
+
+    def status_totals(self, center=None):
+        """Return the number of schedules per status, with every status present."""
+        totals = dict.fromkeys(statuses, 0)
+        with self._lock:
+            for (key_center, _, status), count in self._counts.items():
+                if center is None or key_center == center:
+                    totals[status] = totals.get(status, 0) + count
+        return totals
+
+
+def status_charts(summary):
+    """
+    Build the 'status per month' and 'current status' charts from `ScheduleStats.summary`.
+
+    The charts receive one row per (month, status), so the spec sent to the browser stays
+    the same size however many schedules there are.
+    """
+    import altair as alt
+
+    per_month = summary.groupby(["Month", "Status"], as_index=False)["Count"].sum()
+    status_plot = (
+        alt.Chart(per_month)
+        .mark_bar()
+        .encode(
+            x="Month:O",
+            y="Count:Q",
+            xOffset="Status:N",
+            color="Status:N",
+        )
+        .configure_legend(
+            orient="bottom", titleFontSize=14, labelFontSize=14, titlePadding=5
+        )
+    )
+
+    per_status = summary.groupby("Status", as_index=False)["Count"].sum()
+    status_distribution_plot = (
+        alt.Chart(per_status)
+        .mark_arc()
+        .encode(theta="Count:Q", color="Status:N")
+        .properties(height=300)
+        .configure_legend(
+            orient="bottom", titleFontSize=14, labelFontSize=14, titlePadding=5
+        )
+    )
+    return status_plot, status_distribution_plot
@@ -0,0 +1,210 @@
+import datetime
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from schedule_frame import compact_schedules, concat_schedules
+
+
+class ScheduleStore:
+    """
+    In-memory copy of the Schedules table, kept up to date incrementally.
+
+    The first call to `get` loads the schedules whose drop-off date falls inside the window
+    (the last `window_days` days and everything after). After that only the rows created after
+    the `Created_At` watermark are fetched, plus the rows explicitly marked as changed through
+    `invalidate`. A refresh happens when the store was invalidated or when `refresh_interval`
+    seconds have passed, so inserts made by other processes are picked up too.
+
+    With a `change_log` (see `change_log.ScheduleChangeLog`) the watermark is not used: every
+    refresh asks the log which schedules changed since the `version` already loaded and reads
+    only those, so status changes and cancellations made by other processes are picked up as
+    well, and a refresh with nothing to read costs a single query on the log. Every writer must
+    then record its changes in the log.
+
+    A single instance is meant to be shared by every session (see `st.cache_resource`).
+    The DataFrame returned by `get` is shared as well and must be treated as read-only; its
+    columns are compact and typed (see `schedule_frame.compact_schedules`), so filtering it
+    gives copy-on-write views and sessions add almost nothing to the memory used.
+    An index on Schedules (Created_At) keeps the incremental query cheap.
+
+    Parameters:
+        engine (sqlalchemy.Engine): Engine used to read the Schedules table.
+        window_days (int or None): Days in the past to keep loaded. None loads the whole history.
+        refresh_interval (float): Seconds after which new rows are fetched even without an invalidation.
+        change_log (ScheduleChangeLog): Log of the writes to the Schedules table, if they are logged.
+    """
+
+    def __init__(self, engine, window_days=90, refresh_interval=30.0, change_log=None):
+        self.engine = engine
+        self.window_days = window_days
+        self.refresh_interval = refresh_interval
+        self.change_log = change_log
+        # Version of the change log the loaded rows are up to date with
+        self.version = None
+
+        self._lock = threading.Lock()
+        self._df = None
+        self._watermark = None
+        # IDs created in the watermark second: '>=' reads them again on every refresh
+        self._watermark_ids = set()
+        self._last_refresh = 0.0
+        self._stale = False
+        self._changed_ids = set()
+        self._listeners = []
+
+    def _window_start(self):
+        if self.window_days is None:
+            return None
+        return datetime.date.today() - datetime.timedelta(days=self.window_days)
+
+    def _read(self, where, params, expanding=(), window=True):
+        query = "SELECT * FROM Schedules"
+        window_start = self._window_start() if window else None
+        conditions = list(where)
+        if window_start is not None:
+            conditions.append("Dropoff_Date >= :window_start")
+            params = dict(params, window_start=window_start)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        statement = text(query)
+        if expanding:
+            statement = statement.bindparams(*[bindparam(name, expanding=True) for name in expanding])
+        with self.engine.connect() as conn:
+            return compact_schedules(pd.read_sql(statement, conn, params=params))
+
+    def _merge(self, new_rows):
+        if new_rows.empty:
+            return
+        # Rows fetched again (same ID) replace the version already in memory
+        kept = self._df[~self._df["ID"].isin(new_rows["ID"])]
+        self._df = concat_schedules([kept, new_rows])
+
+    def _in_window(self, rows):
+        window_start = self._window_start()
+        if window_start is None or rows.empty:
+            return rows
+        return rows[rows["Dropoff_Date"] >= pd.Timestamp(window_start)]
+
+    def _prune(self):
+        # Drop rows that left the window since the last load (e.g. the day changed)
+        window_start = self._window_start()
+        if window_start is None or self._df.empty:
+            return
+        outside = self._df["Dropoff_Date"] < pd.Timestamp(window_start)
+        if outside.any():
+            self._df = self._df[~outside].reset_index(drop=True)
+
+    def _refresh(self):
+        removed = set()
+        if self.change_log is not None and self._df is not None:
+            changes = self.change_log.changes_since(self.version)
+            if changes is None:
+                # The log was pruned past the loaded version: start over, and tell the listeners
+                # about the schedules that are gone. Those that only left the window still exist
+                removed = set(self._in_window(self._df)["ID"])
+                self._df = None
+            else:
+                changed_ids, self.version = changes
+                self._changed_ids.update(changed_ids)
+
+        if self._df is None:
+            if self.change_log is not None:
+                # Read before the rows, so writes made during the load are read again next time
+                self.version = self.change_log.version()
+            self._df = self._read([], {})
+            removed -= set(self._df["ID"])
+            updates = [self._df]
+        else:
+            updates = []
+            if self.change_log is None:
+                where, params = [], {}
+                if self._watermark is not None:
+                    # '>=' because Created_At has one second resolution, so rows of the same second
+                    # inserted after the last read are not missed
+                    where.append("Created_At >= :watermark")
+                    params["watermark"] = self._watermark
+                fetched = self._read(where, params)
+                # Only the rows not loaded yet; without them the frame is not rebuilt
+                updates.append(fetched[~fetched["ID"].isin(self._watermark_ids)])
+                self._merge(updates[0])
+
+            if self._changed_ids:
+                # Read without the window: the full-history grid also edits older schedules. The
+                # listeners get every changed schedule; only those inside the window are kept here
+                changed = self._read(["ID IN :ids"], {"ids": list(self._changed_ids)}, expanding=("ids",),
+                                     window=False)
+                removed = self._changed_ids - set(changed["ID"])
+                self._df = self._df[~self._df["ID"].isin(removed)]
+                self._merge(self._in_window(changed))
+                updates.append(changed)
+            self._prune()
+
+        if not updates:
+            rows = self._df.iloc[:0]
+        else:
+            rows = concat_schedules(updates) if len(updates) > 1 else updates[0]
+        if not rows.empty or removed:
+            for listener in self._listeners:
+                listener(rows, removed)
+
+        if self.change_log is None and not rows.empty:
+            # Same text form as the column, so the comparison works whatever type it has in the database
+            created_at = pd.to_datetime(self._df["Created_At"])
+            latest = created_at.max()
+            self._watermark = latest.strftime("%Y-%m-%d %H:%M:%S")
+            self._watermark_ids = set(self._df.loc[created_at == latest, "ID"])
+        self._changed_ids = set()
+        self._stale = False
+        self._last_refresh = time.monotonic()
+
+    def get(self):
+        """
+        Return the schedules inside the window, fetching only what changed since the last call.
+
+        Returns:
+            pandas.DataFrame: The cached schedules. Do not modify it in place.
+        """
+        with self._lock:
+            if (self._df is None or self._stale
+                    or time.monotonic() - self._last_refresh >= self.refresh_interval):
+                self._refresh()
+            return self._df
+
+    def add_listener(self, listener):
+        """
+        Register a function called with every batch of rows read from the database.
+
+        The listener receives `(rows, removed_ids)`: the new or changed schedules as a DataFrame
+        (changed ones are passed even when they are older than the window, though the store does
+        not keep them) and the IDs of the schedules that were deleted. Schedules that only left
+        the window are not reported, since they still exist. It is called once with everything
+        already loaded, so it can build its own state from there and then follow the changes.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+            if self._df is not None:
+                listener(self._df, set())
+
+    def invalidate(self, ids=None):
+        """
+        Mark the store as stale so the next `get` fetches the new rows.
+
+        Parameters:
+            ids (iterable): IDs of existing schedules that were updated or deleted and must be read again.
+        """
+        with self._lock:
+            self._stale = True
+            if ids is not None:
+                self._changed_ids.update(ids)
+
+    def reset(self):
+        """Forget everything that was loaded; the next `get` reloads the whole window."""
+        with self._lock:
+            self._df = None
+            self._watermark = None
+            self._watermark_ids = set()
+            self.version = None
+            self._changed_ids = set()
@@ -0,0 +1,119 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+import rules
+from schedule_frame import to_datetimes
+
+MINUTES_PER_DAY = 24 * 60
+
+SLOT_COLUMNS = ["Distribution_Center", "Dropoff_Date", "Dropoff_Time", "Finishing_Time"]
+
+
+def _labels(minutes):
+    return np.array([f"{minute // 60 % 24:02d}:{minute % 60:02d}" for minute in minutes])
+
+
+def _booking_arrays(bookings, center, first_day, n_days):
+    """Return day offset, start minute and end minute of the active bookings of a center."""
+    rows = bookings[(bookings["Distribution_Center"] == center)
+                    & bookings["Status"].isin(rules.active_statuses)]
+    if rows.empty:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    days = (to_datetimes(rows["Dropoff_Date"]) - pd.Timestamp(first_day)).dt.days.to_numpy()
+    in_range = (days >= 0) & (days < n_days)
+    rows, days = rows[in_range], days[in_range]
+
+    times = rows["Dropoff_Time"]
+    if pd.api.types.is_timedelta64_dtype(times):
+        starts = (times.dt.total_seconds() // 60).to_numpy(dtype=np.int64)
+    elif isinstance(times.dtype, pd.CategoricalDtype):
+        # Parse each distinct time once (see schedule_frame.compact_schedules)
+        minutes = np.array([rules.to_minutes(value) for value in times.cat.categories], dtype=np.int64)
+        starts = minutes[times.cat.codes.to_numpy()]
+    else:
+        starts = np.fromiter((rules.to_minutes(value) for value in times), dtype=np.int64, count=len(times))
+    durations = rows["Load_Type"].map(rules.duration_minutes).to_numpy(dtype=np.int64)
+    return days.astype(np.int64), starts, starts + durations
+
+
+def find_free_slots(bookings, start_date, end_date, load_type, centers=None, step_minutes=30, not_before=None):
+    """
+    Find every start time at which a new booking would be accepted.
+
+    For each distribution center the occupancy of every minute of every day in the range is
+    built at once with NumPy, and each candidate start (every `step_minutes` inside the opening
+    window) is checked against the daily limit (`max_schedules`), the opening window and the
+    docks in use during the whole unload (`max_simulatenous`).
+
+    Parameters:
+        bookings (pandas.DataFrame): Existing schedules with the Schedules table columns.
+        start_date (datetime.date): First day of the range.
+        end_date (datetime.date): Last day of the range (inclusive).
+        load_type (str): Load type of the new booking, which sets how long the unload takes.
+        centers (list): Distribution centers to look at. Defaults to every center in `rules.max_schedules`.
+        step_minutes (int): Distance between two candidate start times.
+        not_before (datetime.datetime): Slots starting before this moment are left out. Defaults to now.
+
+    Returns:
+        pandas.DataFrame: One row per free slot, with the columns
+            'Distribution_Center', 'Dropoff_Date', 'Dropoff_Time' and 'Finishing_Time' (times as 'HH:MM').
+    """
+    if centers is None:
+        centers = list(rules.max_schedules)
+    if not_before is None:
+        not_before = datetime.datetime.now()
+    n_days = (end_date - start_date).days + 1
+    duration = rules.duration_minutes(load_type)
+    if n_days <= 0:
+        return pd.DataFrame(columns=SLOT_COLUMNS)
+
+    # Offset of the first allowed start on each day of the range
+    day_offsets = np.arange(n_days)
+    first_allowed = np.zeros(n_days, dtype=np.int64)
+    today_offset = (not_before.date() - start_date).days
+    if 0 <= today_offset < n_days:
+        first_allowed[today_offset] = not_before.hour * 60 + not_before.minute
+    first_allowed[day_offsets < today_offset] = MINUTES_PER_DAY
+
+    results = []
+    for center in centers:
+        days, starts, ends = _booking_arrays(bookings, center, start_date, n_days)
+
+        # Occupancy per minute: +1 where an unload starts, -1 where it ends, then a running sum.
+        # The grid goes past midnight so unloads ending on the next day are still counted.
+        width = MINUTES_PER_DAY + max(duration, int(ends.max(initial=0)) - MINUTES_PER_DAY, 0) + 1
+        occupancy = np.zeros((n_days, width), dtype=np.int32)
+        np.add.at(occupancy, (days, starts), 1)
+        np.add.at(occupancy, (days, ends), -1)
+        occupancy = occupancy.cumsum(axis=1)
+        bookings_per_day = np.bincount(days, minlength=n_days)
+
+        opening = rules.to_minutes(rules.minimum_time[center])
+        closing = rules.to_minutes(rules.maximum_time[center])
+        candidates = np.arange(opening, closing + 1, step_minutes)
+        if duration > 0:
+            # Highest occupancy during [candidate, candidate + duration) for every day and candidate
+            windows = np.lib.stride_tricks.sliding_window_view(occupancy, duration, axis=1)
+            peak = windows[:, candidates].max(axis=2)
+        else:
+            peak = np.zeros((n_days, len(candidates)), dtype=np.int32)
+
+        free = ((peak < rules.max_simulatenous)
+                & (bookings_per_day < rules.max_schedules[center])[:, None]
+                & (candidates[None, :] >= first_allowed[:, None]))
+        free_days, free_candidates = np.nonzero(free)
+        if len(free_days) == 0:
+            continue
+        results.append(pd.DataFrame({
+            "Distribution_Center": center,
+            "Dropoff_Date": (pd.Timestamp(start_date) + pd.to_timedelta(free_days, unit="D")).date,
+            "Dropoff_Time": _labels(candidates)[free_candidates],
+            "Finishing_Time": _labels(candidates + duration)[free_candidates],
+        }))
+
+    if not results:
+        return pd.DataFrame(columns=SLOT_COLUMNS)
+    return pd.concat(results, ignore_index=True)
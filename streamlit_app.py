@@ -1,32 +1,21 @@
 import datetime
-import os
+import time
 import pandas as pd
 import streamlit as st
 import mysql.connector
 from mysql.connector import Error
-from datetime import time
-
-def get_finishing_time(start_date, start_time, type):
-    # Define offloading durations for each type
-    offloading_duration = {
-        "Pallet Monoproduto": datetime.timedelta(minutes=30),
-        "Pallet Misto": datetime.timedelta(minutes=60),
-        "Estivado": datetime.timedelta(minutes=120)
-    }
-
-    # Combine start_date and start_time into a single datetime object
-    start_datetime = datetime.datetime.combine(start_date, start_time)
-
-    # Retrieve the offloading time for the specified type
-    # Default to zero timedelta if the type is not found
-    duration = offloading_duration.get(type, datetime.timedelta())
-
-    # Calculate end_time by adding the offloading duration to start_datetime
-    end_time = start_datetime + duration
-
-    # Return only the time component
-    return end_time.time()
-
+from billing import price_list
+from capacity import CapacityIndex
+from edits import editor_changes, editor_key
+from file_storage import ScheduleFileStorage
+from schedule_frame import compact_schedules, enable_copy_on_write
+from schedule_stats import ScheduleStats, status_charts
+from slots import find_free_slots
+from tracing import tracer
+
+# Every session filters the one shared snapshot; with copy-on-write (a process-wide pandas option,
+# the default from pandas 3 on) those views are not copied unless written to
+enable_copy_on_write()
 
 # Function to connect to MySQL
 def create_connection():
@@ -67,12 +56,8 @@ def insert_schedule(schedule_data):
     else:
         st.error("Could not establish a database connection.")
 
-# Initialize connection.
-conn = st.connection('mysql', type='sql')
-
-# Perform query.
-df = conn.query('SELECT * from Scheduling;', ttl=600)
-
+# Timed until the end of the script, so every rerun is measured as a whole
+rerun_started = time.perf_counter()
 
 # Set the page configuration
 st.set_page_config(page_title="Agendamento de Entrega", page_icon="📅")
@@ -88,28 +73,80 @@ st.write(
     """
 )
 
-dicionario_precos = {
-    "Tipo da carga": ["Pallet monoproduto", "Pallet misto", "Estivado (por tonelada)"],
-    "Valor unitário": ["R$ 35,00", "R$ 45,00", "R$ 62,00"]
-}
-
-# Creating the DataFrame
-dataframe_precos = pd.DataFrame(dicionario_precos)
-st.table(dataframe_precos)
+st.table(price_list())
 
-# Define the path for the CSV file
+# Define the path for the CSV file (imported once into the partitioned storage)
 csv_file_path = "schedules.csv"
 
-# Load existing schedules from CSV or create a new dataframe
-if os.path.exists(csv_file_path):
-    df = pd.read_csv(csv_file_path)
-else:
-    # Create an empty dataframe with the necessary columns
-    df = pd.DataFrame(
-        columns=["ID", "Indústria", "Número da NF", "Drop-off Date", "Drop-off Time", "Finishing Time", "Status",
-                 "Centro de Distribuição", "Tipo de Carga",
-                 "Número de Pallets", "Peso Total", "Número de SKUs", "Data de Criação"])
-    df.to_csv(csv_file_path, index=False)  # Save the initial dataframe
+# CSV columns mapped to the Schedules table columns used by the scheduling rules
+csv_columns = {
+    "Centro de Distribuição": "Distribution_Center",
+    "Drop-off Date": "Dropoff_Date",
+    "Drop-off Time": "Dropoff_Time",
+    "Tipo de Carga": "Load_Type"
+}
+
+# Months shown on the page, counted back from the current one; older partitions are not read
+visible_months = 3
+
+# Seconds between two checks of the partitions; a booking made anywhere is on every page within this delay
+change_poll_seconds = 2
+
+@st.cache_resource
+def get_file_storage():
+    # Schedules partitioned by month; new bookings and edits are appended as small delta files
+    storage = ScheduleFileStorage(legacy_csv_path=csv_file_path)
+    storage.start_compactor()
+    return storage
+
+@st.cache_resource(max_entries=2)
+def get_schedule_snapshot(start_month, version):
+    # One typed, read-only copy per process, shared by every session and rebuilt only when the
+    # partitions change; sessions filter it into copy-on-write views
+    return compact_schedules(get_file_storage().read(start_month=start_month), columns=csv_columns)
+
+@st.fragment(run_every=change_poll_seconds)
+def follow_changes():
+    # Reruns the page once a partition changed (a booking or an edit made in any session or process);
+    # checking costs a few stat calls, and the snapshot is only rebuilt when the version moved
+    if st.session_state.get("schedules_version") != get_file_storage().version():
+        st.rerun()
+
+first_visible_month = (pd.Timestamp.today().to_period("M") - (visible_months - 1)).strftime("%Y-%m")
+with tracer.span("load_schedules"):
+    df = get_schedule_snapshot(first_visible_month, get_file_storage().version())
+
+# Column names of the CSV mode, in the order expected by ScheduleStats.apply_rows
+stats_columns = ("ID", "Centro de Distribuição", "Drop-off Date", "Status")
+
+@st.cache_resource
+def get_schedule_stats():
+    # Counted once from the visible months, then updated on every append and edit
+    stats = ScheduleStats()
+    stats.apply_rows(get_file_storage().read(start_month=first_visible_month), columns=stats_columns)
+    return stats
+
+@st.cache_resource
+def get_capacity_index():
+    # Built once from the visible months, then updated on every append and edit; new bookings take
+    # their slot in it before they are written, so two sessions cannot get the same last one
+    index = CapacityIndex()
+    index.apply_rows(get_file_storage().read(start_month=first_visible_month).rename(columns=csv_columns))
+    return index
+
+# Free slots for every distribution center, so the supplier can pick a time that will be accepted
+with st.expander("Horários disponíveis"):
+    col_start, col_end, col_load_type = st.columns(3)
+    slots_start = col_start.date_input("De", value=datetime.date.today(), min_value=datetime.date.today(),
+                                       key="slots_start")
+    slots_end = col_end.date_input("Até", value=datetime.date.today() + datetime.timedelta(days=30),
+                                   min_value=datetime.date.today(), key="slots_end")
+    slots_load_type = col_load_type.selectbox("Tipo de Carga", ["Pallet Monoproduto", "Pallet Misto", "Estivado"],
+                                              key="slots_load_type")
+    with tracer.span("free_slots"):
+        free_slots = find_free_slots(df.rename(columns=csv_columns), slots_start, slots_end, slots_load_type)
+    st.write(f"Horários livres: `{len(free_slots)}`")
+    st.dataframe(free_slots, use_container_width=True, hide_index=True)
 
 # Section to add a new schedule
 st.header("Adicionar Agendamento")
@@ -127,35 +164,17 @@ with st.form("add_schedule_form"):
     sku_number = st.number_input("Número de SKUs", step=1)
     submitted = st.form_submit_button("Enviar")
 
-# Define the maximum number of schedules allowed per day
-max_schedules = {'CLAS': 10, 'JSL': 6, 'GPA': 7}
-
-# Define the maximum number of simultaneous schedules
-max_simulatenous = 2
-
-# Minimum Time
-minimum_time = {'CLAS': time(7, 0), 'JSL': time(13, 00), 'GPA': time(7, 0)}
-
-# Maximum Time
-maximum_time = {'CLAS': time(15, 0), 'JSL': time(20, 00), 'GPA': time(14, 0)}
-
 if submitted:
-    # Check how many schedules are already set for the selected drop-off date
-    schedules_on_date = df[(df["Drop-off Date"] == str(dropoff_date)) &
-                           (df["Centro de Distribuição"] == distribution_center)]
-    if len(schedules_on_date) >= max_schedules[distribution_center]:
-        st.error(
-            f"Não é possível agendar mais de {max_schedules[distribution_center]} entregas para o dia {dropoff_date} por Centro de Distribuição.")
-    elif dropoff_time < minimum_time[distribution_center] or dropoff_time > maximum_time[distribution_center]:
-        st.error(
-            f"É necessário agendar entre às {minimum_time[distribution_center]} e {maximum_time[distribution_center]}")
+    # Check the daily limit, the opening window and the docks in use at the chosen time, and take the slot
+    schedule_id = get_file_storage().next_id()
+    with tracer.span("validation"):
+        rejection = get_capacity_index().check_and_reserve(schedule_id, distribution_center, dropoff_date,
+                                                           dropoff_time, load_type, status)
+    if rejection is not None:
+        st.error(rejection)
     else:
-        if df.empty or df.ID.isnull().all():
-            recent_schedule_id = 0
-        else:
-            recent_schedule_id = int(max(df.ID).split("-")[1])
         new_schedule = {
-            "ID": f"SCHEDULE-{recent_schedule_id + 1}",
+            "ID": schedule_id,
             "Indústria": supplier_name,
             "Número da NF": invoice,
             "Drop-off Date": dropoff_date,
@@ -169,15 +188,16 @@ if submitted:
             "Data de Criação": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
 
-        # Insert the new schedule into MySQL database
-        insert_query = """
-                    INSERT INTO Scheduling 
-                    (ID, Supplier_Name, Invoice_Number, Dropoff_Date, Dropoff_Time, Status, Distribution_Center, Load_Type, 
-                    Pallet_Number, Total_Weight, SKU_Count, Created_At) 
-                    VALUES (%(ID)s, %(Supplier_Name)s, %(Invoice_Number)s, %(Dropoff_Date)s, %(Dropoff_Time)s, %(Status)s, 
-                            %(Distribution_Center)s, %(Load_Type)s, %(Pallet_Number)s, %(Total_Weight)s, %(SKU_Count)s, %(Created_At)s);
-                """
-        conn.execute(insert_query, new_schedule)
+        # Append the new schedule to the month partition of its drop-off date
+        appended = False
+        try:
+            with tracer.span("insert"):
+                get_file_storage().append([new_schedule])
+            appended = True
+        finally:
+            if not appended:
+                get_capacity_index().remove(schedule_id)
+        get_schedule_stats().apply_rows(pd.DataFrame([new_schedule]), columns=stats_columns)
 
         st.success("Agendamento enviado! Aqui estão os detalhes:")
         st.dataframe(pd.DataFrame([new_schedule]), use_container_width=True, hide_index=True)
@@ -200,8 +220,11 @@ st.info(
     icon="✍️",
 )
 
+# Pending edits are dropped when the filter or the schedules shown change
+grid_editor_key = editor_key("schedules_editor", df)
 edited_df = st.data_editor(
     df,
+    key=grid_editor_key,
     use_container_width=True,
     hide_index=True,
     column_config={
@@ -211,50 +234,56 @@ edited_df = st.data_editor(
             options=["Agendado", "Completo", "Cancelado"],
             required=True,
         ),
+        "Drop-off Date": st.column_config.DateColumn("Drop-off Date", format="YYYY-MM-DD"),
     },
     disabled=["ID", "Indústria", "Número da NF", "Drop-off Date", "Drop-off Time", "Centro de Distribuição",
               "Tipo de Carga", "Número de Pallets", "Peso Total", "Número de SKUs"],
 )
 
-# Save edits back to CSV
+# Save only the rows in the editor's change set, and only when they differ from what was loaded
 if edited_df is not None:
+    schedule_changes = editor_changes(df, st.session_state[grid_editor_key]["edited_rows"])
+    if schedule_changes:
+        changed_ids = [schedule_id for schedule_id, _ in schedule_changes]
+        changed_rows = edited_df[edited_df["ID"].isin(changed_ids)]
+        # Written only where the stored values are still the ones the edit started from
+        expected = {schedule_id: {column: old for column, (old, _) in changed.items()}
+                    for schedule_id, changed in schedule_changes}
+        with tracer.span("save_changes", rows=len(changed_rows)):
+            saved = get_file_storage().update(changed_rows, expected=expected)
+        saved_rows = changed_rows[changed_rows["ID"].isin(saved["updated"])]
+        get_schedule_stats().apply_rows(saved_rows, columns=stats_columns)
+        get_capacity_index().apply_rows(saved_rows.rename(columns=csv_columns))
+        # The change set is written once; the next rerun starts from the stored schedules
+        del st.session_state[grid_editor_key]
+        if saved["conflicts"]:
+            st.warning(f"Agendamentos alterados por outro usuário e não salvos: {', '.join(saved['conflicts'])}. "
+                       "Edite-os novamente.")
     df = edited_df
-    df.to_csv(csv_file_path, index=False)
 
 # Show some metrics and charts about the schedules
 st.header("Statistics")
 
+stats_center = None if distribution_center_filter == "Todos" else distribution_center_filter
+status_totals = get_schedule_stats().status_totals(stats_center)
 col1, col2, col3 = st.columns(3)
-num_scheduled = len(df[df.Status == "Agendado"])
+num_scheduled = status_totals["Agendado"]
 col1.metric(label="Number of scheduled drop-offs", value=num_scheduled, delta=5)
-col2.metric(label="Completo drop-offs", value=len(df[df.Status == "Completo"]))
-col3.metric(label="Cancelado drop-offs", value=len(df[df.Status == "Cancelado"]))
+col2.metric(label="Completo drop-offs", value=status_totals["Completo"])
+col3.metric(label="Cancelado drop-offs", value=status_totals["Cancelado"])
+
+with tracer.span("charts"):
+    status_plot, status_distribution_plot = status_charts(get_schedule_stats().summary(stats_center))
 
 st.write("")
 st.write("##### Drop-off status per month")
-status_plot = (
-    alt.Chart(df)
-    .mark_bar()
-    .encode(
-        x="month(Drop-off Date):O",
-        y="count():Q",
-        xOffset="Status:N",
-        color="Status:N",
-    )
-    .configure_legend(
-        orient="bottom", titleFontSize=14, labelFontSize=14, titlePadding=5
-    )
-)
 st.altair_chart(status_plot, use_container_width=True, theme="streamlit")
 
 st.write("##### Current drop-off statuses")
-status_distribution_plot = (
-    alt.Chart(df)
-    .mark_arc()
-    .encode(theta="count():Q", color="Status:N")
-    .properties(height=300)
-    .configure_legend(
-        orient="bottom", titleFontSize=14, labelFontSize=14, titlePadding=5
-    )
-)
 st.altair_chart(status_distribution_plot, use_container_width=True, theme="streamlit")
+
+# Writes made by this run were already reported on the page; only later changes rerun it
+st.session_state["schedules_version"] = get_file_storage().version()
+follow_changes()
+
+tracer.record("rerun", time.perf_counter() - rerun_started)
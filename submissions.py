@@ -0,0 +1,156 @@
+import collections
+import datetime
+import hashlib
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+
+def submission_key(form_session, supplier, invoice, dropoff_date, center):
+    """
+    Return the idempotency key of a booking sent with the form.
+
+    Parameters:
+        form_session (str): Random token kept in the session state of the page.
+        supplier (str): Supplier name; case and surrounding spaces are ignored.
+        invoice (str): Invoice number; surrounding spaces are ignored.
+        dropoff_date (datetime.date): Drop-off date.
+        center (str): Distribution center.
+
+    Returns:
+        str: A 64 character hexadecimal key.
+    """
+    parts = [form_session, str(supplier).strip().casefold(), str(invoice).strip(), str(dropoff_date), center]
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+class SubmissionGuard:
+    """
+    Makes sending the booking form idempotent: each key creates at most one schedule.
+
+    `submit` runs the booking once per key and hands the same result to every repeat
+    (a double click, or a rerun while the first submit is still waiting on the database or
+    Pipefy). It looks in three places, cheapest first:
+
+    - Recent results kept in memory for `ttl_seconds`, answered without touching the database.
+    - A submit of the same key already running in this process, which is waited for.
+    - The Submissions table, whose primary key is the submission key. The booking writes its
+      key there in the same transaction as the schedule (see `record`), so when two processes
+      race, the second insert fails on the primary key, its schedule is rolled back, and the
+      schedule of the first one is returned instead.
+
+    Parameters:
+        engine (sqlalchemy.Engine): Engine of the database holding the Schedules table.
+        ttl_seconds (float): How long a result is kept in memory.
+        max_entries (int): Results kept in memory at most; the oldest are dropped first.
+    """
+
+    def __init__(self, engine, ttl_seconds=600, max_entries=10_000):
+        self.engine = engine
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._results = collections.OrderedDict()
+        self._in_flight = {}
+        self._create_table()
+
+    def _create_table(self):
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS Submissions (
+                    Submission_Key VARCHAR(64) PRIMARY KEY,
+                    Schedule_ID VARCHAR(32) NOT NULL,
+                    Created_At VARCHAR(19) NOT NULL
+                )
+            """))
+
+    def record(self, conn, key, schedule_id):
+        """
+        Store the key of a booking, in the transaction that inserts its schedule.
+
+        Raises:
+            sqlalchemy.exc.IntegrityError: If the key was already used; the transaction must be rolled back.
+        """
+        conn.execute(text("INSERT INTO Submissions (Submission_Key, Schedule_ID, Created_At) "
+                          "VALUES (:key, :schedule_id, :created_at)"),
+                     {"key": key, "schedule_id": schedule_id,
+                      "created_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
+
+    def find(self, key):
+        """Return the schedule created with the key as a dict, or None if the key was not used."""
+        with self.engine.connect() as conn:
+            row = conn.execute(text("SELECT s.* FROM Submissions k JOIN Schedules s ON s.ID = k.Schedule_ID "
+                                    "WHERE k.Submission_Key = :key"), {"key": key}).mappings().first()
+        return dict(row) if row is not None else None
+
+    def _remember(self, key, result):
+        with self._lock:
+            self._results[key] = (time.monotonic() + self.ttl_seconds, result)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+    def _cached(self, key):
+        # Called with the lock held
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._results[key]
+            return None
+        return entry[1]
+
+    def submit(self, key, create):
+        """
+        Run `create` once for the key and return its result to every caller.
+
+        Parameters:
+            key (str): See `submission_key`.
+            create (callable): Books the schedule and returns it (a dict), or None if it was
+                rejected. It must call `record` in the transaction that inserts the schedule.
+                Rejected or failed bookings are not remembered, so they can be sent again.
+
+        Returns:
+            tuple: The schedule and whether it had already been created by an earlier submit.
+        """
+        while True:
+            with self._lock:
+                result = self._cached(key)
+                if result is not None:
+                    return result, True
+                running = self._in_flight.get(key)
+                if running is None:
+                    self._in_flight[key] = threading.Event()
+                    break
+            # Same key being booked by another thread: wait for its result, or for its failure and retry
+            running.wait()
+
+        try:
+            result = self.find(key)
+            if result is not None:
+                duplicate = True
+            else:
+                try:
+                    result, duplicate = create(), False
+                except IntegrityError:
+                    # Another process booked the same key between the lookup and the insert
+                    result, duplicate = self.find(key), True
+                    if result is None:
+                        raise
+            if result is not None:
+                self._remember(key, result)
+            return result, duplicate
+        finally:
+            with self._lock:
+                self._in_flight.pop(key).set()
+
+    def prune(self, max_age_days=30):
+        """Forget the keys older than `max_age_days`; the schedules themselves are kept."""
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=max_age_days)
+        with self.engine.begin() as conn:
+            conn.execute(text("DELETE FROM Submissions WHERE Created_At < :cutoff"),
+                         {"cutoff": cutoff.strftime("%Y-%m-%d %H:%M:%S")})
+
@@ -1,57 +1,12 @@
 import datetime
-import pandas as pd
+import tempfile
+import time
+import uuid
 import streamlit as st
-from sqlalchemy import create_engine, text
-from sqlalchemy.exc import SQLAlchemyError
-from datetime import time
-from sqlalchemy.orm import sessionmaker
-from pipefy import create_pipefy_card
-
-def get_finishing_time(start_date, start_time, category):
-    offloading_duration = {
-        "Pallet Monoproduto": datetime.timedelta(minutes=30),
-        "Pallet Misto": datetime.timedelta(minutes=60),
-        "Estivado": datetime.timedelta(minutes=120)
-    }
-    start_datetime = datetime.datetime.combine(start_date, start_time)
-    duration = offloading_duration.get(category, datetime.timedelta())
-    end_time = start_datetime + duration
-    return end_time.time()
-
-# SQLAlchemy connection setup
-db_config = st.secrets["mysql"]
-engine = create_engine(
-    f"mysql+pymysql://{db_config['username']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['database']}"
-)
-
-# Set up a session
-Session = sessionmaker(bind=engine)
-session = Session()
-
-def insert_schedule(schedule_data):
-    try:
-        insert_query = text("""
-            INSERT INTO Schedules 
-            (ID, Supplier_Name, Invoice_Number, Dropoff_Date, Dropoff_Time, Status, Distribution_Center, Load_Type, 
-            Pallet_Number, Total_Weight, SKU_Count, Created_At) 
-            VALUES (:ID, :Supplier_Name, :Invoice_Number, :Dropoff_Date, :Dropoff_Time, :Status, 
-                    :Distribution_Center, :Load_Type, :Pallet_Number, :Total_Weight, :SKU_Count, :Created_At);
-        """)
-        session.execute(insert_query, schedule_data)
-        session.commit()  # Commit the transaction
-        st.success("Agendamento enviado! Aqui estão os detalhes:")
-        st.dataframe(pd.DataFrame([schedule_data]), use_container_width=True, hide_index=True)
-    except SQLAlchemyError as e:
-        session.rollback()  # Rollback in case of error
-        st.error(f"Erro ao inserir o agendamento: {str(e)}")
-    finally:
-        session.close()
+from tracing import start_metrics_server, start_trace_log, tracer
 
-def load_schedules():
-    with engine.connect() as conn:
-        query = "SELECT * FROM Schedules"
-        dataframe = pd.read_sql(query, conn)
-    return dataframe
+# Timed until the end of the script, so every rerun is measured as a whole
+rerun_started = time.perf_counter()
 
 # Set the page configuration
 st.set_page_config(page_title="Agendamento de Entrega", page_icon="📅")
@@ -67,18 +22,190 @@ st.write(
     """
 )
 
+# Everything above is static, so it is on screen before pandas, SQLAlchemy or the database are touched
+tracer.record("first_paint", time.perf_counter() - rerun_started)
 
-dicionario_precos = {
-    "Tipo da carga": ["Pallet monoproduto", "Pallet misto", "Estivado (por tonelada)"],
-    "Valor unitário": ["R$ 35,00", "R$ 45,00", "R$ 62,00"]
-}
+# The data layer is imported only now; on a cold start these imports take most of the first run
+import pandas as pd
+from sqlalchemy.exc import SQLAlchemyError
+from billing import format_brl, monthly_invoices, price_list
+from bookings import book_schedule
+from capacity import CapacityIndex
+from change_log import ScheduleChangeLog
+from database import Database
+from edits import editor_changes, editor_key, save_changes
+from export import export_formats, export_schedules
+from pipefy import schedule_card
+from optimizer import suggest_schedule
+from schedule_ids import ScheduleIdAllocator
+from schedule_frame import enable_copy_on_write
+from schedule_queries import count_schedules, create_indexes, distinct_centers, fetch_page, fetch_status_rows
+from schedule_stats import ScheduleStats, status_charts
+from schedule_store import ScheduleStore
+from slots import find_free_slots
+from submissions import SubmissionGuard, submission_key
+
+# Every session filters the one snapshot of the schedule store; with copy-on-write (a process-wide
+# pandas option, the default from pandas 3 on) those views are not copied unless written to
+enable_copy_on_write()
+
+st.table(price_list())
+
+@st.cache_resource
+def get_database():
+    # One connection pool per process; each session checks connections out of it
+    database = Database.from_config(st.secrets["mysql"])
+    create_indexes(database)
+    tracer.register_gauges("db_pool", database.pool_metrics)
+    return database
+
+@st.cache_resource
+def get_metrics_server():
+    # Prometheus endpoint, only when a port is configured in the [metrics] secrets
+    port = st.secrets.get("metrics", {}).get("port")
+    return start_metrics_server(int(port)) if port else None
+
+@st.cache_resource
+def get_trace_log():
+    # One JSON line per span, only when enabled in the [tracing] secrets: log = true writes them to
+    # the standard error of the process, log_file = "trace.jsonl" to a file
+    settings = st.secrets.get("tracing", {})
+    if not settings.get("log") and not settings.get("log_file"):
+        return None
+    return start_trace_log(settings.get("log_file"))
+
+@st.cache_resource
+def get_pipefy_outbox():
+    # One outbox and one delivery thread per process, shared by every session
+    from outbox import PipefyOutbox
+
+    outbox = PipefyOutbox(api_token=st.secrets["pipefy"]["api_token"], pipe_id='305477886')
+    outbox.start()
+    return outbox
+
+# Days in the past loaded into memory; older schedules are not needed to book new ones
+schedule_window_days = 90
 
-# Creating the DataFrame
-dataframe_precos = pd.DataFrame(dicionario_precos)
-st.table(dataframe_precos)
+# Rows per page of the schedules grid
+grid_page_size = 50
 
+# Seconds between two checks of the change log; a change made anywhere is on every page within this delay
+change_poll_seconds = 2
+
+@st.cache_resource
+def get_change_log():
+    # Every insert, status change and cancellation bumps its version in the same transaction
+    change_log = ScheduleChangeLog(get_database())
+    change_log.prune()
+    return change_log
+
+@st.cache_resource
+def get_schedule_store():
+    # Shared by every session; after the first load only the schedules in the change log are read
+    return ScheduleStore(get_database(), window_days=schedule_window_days, refresh_interval=change_poll_seconds,
+                         change_log=get_change_log())
+
+@st.cache_resource
+def get_capacity_index():
+    # Follows the schedule store, so it is built once and then updated row by row
+    index = CapacityIndex()
+    get_schedule_store().add_listener(index.apply_rows)
+    return index
+
+@st.cache_resource
+def get_schedule_stats():
+    # Counts per (center, month, status): the history before the window is read once, the window
+    # and every later change (to any schedule, in the window or not) come from the schedule store
+    stats = ScheduleStats()
+    window_start = datetime.date.today() - datetime.timedelta(days=schedule_window_days)
+    stats.seed(fetch_status_rows(get_database(), {"date_to": window_start - datetime.timedelta(days=1)}))
+    get_schedule_store().add_listener(stats.apply_rows)
+    return stats
+
+@st.cache_resource
+def get_submission_guard():
+    # Bookings of the last minutes per submission key, so a double click or a rerun books only once
+    guard = SubmissionGuard(get_database())
+    guard.prune()
+    return guard
+
+@st.cache_resource
+def get_id_allocator():
+    # IDs come from a counter row, so concurrent submits never get the same one
+    return ScheduleIdAllocator(get_database())
+
+def load_schedules():
+    with tracer.span("load_schedules"):
+        return get_schedule_store().get()
+
+@st.fragment(run_every=change_poll_seconds)
+def follow_changes():
+    # Reruns the page once the schedules it shows changed, in this session or any other. The store
+    # asks the change log at most once per interval for the whole process, however many sessions poll
+    get_schedule_store().get()
+    if st.session_state.get("schedules_version") != get_schedule_store().version:
+        st.rerun()
+
+get_metrics_server()
+get_trace_log()
 df = load_schedules()
 
+# Free slots for every distribution center, so the supplier can pick a time that will be accepted
+with st.expander("Horários disponíveis"):
+    col_start, col_end, col_load_type = st.columns(3)
+    slots_start = col_start.date_input("De", value=datetime.date.today(), min_value=datetime.date.today(),
+                                       key="slots_start")
+    slots_end = col_end.date_input("Até", value=datetime.date.today() + datetime.timedelta(days=30),
+                                   min_value=datetime.date.today(), key="slots_end")
+    slots_load_type = col_load_type.selectbox("Tipo de Carga", ["Pallet Monoproduto", "Pallet Misto", "Estivado"],
+                                              key="slots_load_type")
+    with tracer.span("free_slots"):
+        free_slots = find_free_slots(df, slots_start, slots_end, slots_load_type)
+    st.write(f"Horários livres: `{len(free_slots)}`")
+    st.dataframe(free_slots, use_container_width=True, hide_index=True)
+
+# Start times for a day's requests, placed around the bookings already made so fewer trucks wait
+with st.expander("Sugerir horários"):
+    col_center, col_date = st.columns(2)
+    suggest_center = col_center.selectbox("Centro de Distribuição", ["CLAS", "GPA", "JSL"], key="suggest_center")
+    suggest_date = col_date.date_input("Data", min_value=datetime.date.today(), key="suggest_date")
+    replan_pending = st.checkbox("Reorganizar também os agendamentos pendentes", key="suggest_replan")
+    requested = st.data_editor(
+        pd.DataFrame({"Indústria": pd.Series(dtype=object), "Horário desejado": pd.Series(dtype=object),
+                      "Tipo de Carga": pd.Series(dtype=object)}),
+        key="suggest_requests",
+        num_rows="dynamic",
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "Horário desejado": st.column_config.TimeColumn("Horário desejado", step=1800, required=True),
+            "Tipo de Carga": st.column_config.SelectboxColumn(
+                "Tipo de Carga", options=["Pallet Monoproduto", "Pallet Misto", "Estivado"], required=True),
+        },
+    ).dropna(subset=["Horário desejado", "Tipo de Carga"])
+
+    if st.button("Sugerir"):
+        day = df[(df["Distribution_Center"] == suggest_center) & (df["Dropoff_Date"] == pd.Timestamp(suggest_date))]
+        movable = day[day["Status"] == "Agendado"] if replan_pending else day.iloc[:0]
+        day_requests = pd.concat([
+            movable[["ID", "Distribution_Center", "Dropoff_Date", "Dropoff_Time", "Load_Type"]],
+            pd.DataFrame({
+                "ID": [f"Nova {number}: {supplier or ''}".strip()
+                       for number, supplier in enumerate(requested["Indústria"], start=1)],
+                "Distribution_Center": suggest_center,
+                "Dropoff_Date": suggest_date,
+                "Dropoff_Time": requested["Horário desejado"].tolist(),
+                "Load_Type": requested["Tipo de Carga"].tolist(),
+            }),
+        ], ignore_index=True)
+        with tracer.span("suggest_schedule", requests=len(day_requests)):
+            suggestions = suggest_schedule(day[~day["ID"].isin(movable["ID"])], day_requests)
+        accepted = suggestions[suggestions["Accepted"]]
+        col_accepted, col_wait = st.columns(2)
+        col_accepted.metric("Agendamentos aceitos", f"{len(accepted)} de {len(suggestions)}")
+        col_wait.metric("Espera total (min)", int(accepted["Wait_Minutes"].sum()))
+        st.dataframe(suggestions, use_container_width=True, hide_index=True)
+
 # Section to add a new schedule
 st.header("Adicionar Agendamento")
 
@@ -95,35 +222,14 @@ with st.form("add_schedule_form"):
     sku_number = st.number_input("Número de SKUs", step=1)
     submitted = st.form_submit_button("Enviar")
 
-# Define the maximum number of schedules allowed per day
-max_schedules = {'CLAS': 10, 'JSL': 6, 'GPA': 7}
-
-# Define the maximum number of simultaneous schedules
-max_simulatenous = 2
-
-# Minimum Time
-minimum_time = {'CLAS': time(7, 0), 'JSL': time(13, 00), 'GPA': time(7, 0)}
-
-# Maximum Time
-maximum_time = {'CLAS': time(15, 0), 'JSL': time(20, 00), 'GPA': time(14, 0)}
-
 if submitted:
-    # Check how many schedules are already set for the selected drop-off date
-    schedules_on_date = df[(df["Dropoff_Date"] == str(dropoff_date)) &
-                           (df["Distribution_Center"] == distribution_center)]
-    if len(schedules_on_date) >= max_schedules[distribution_center]:
-        st.error(
-            f"Não é possível agendar mais de {max_schedules[distribution_center]} entregas para o dia {dropoff_date} por Centro de Distribuição.")
-    elif dropoff_time < minimum_time[distribution_center] or dropoff_time > maximum_time[distribution_center]:
-        st.error(
-            f"É necessário agendar entre às {minimum_time[distribution_center]} e {maximum_time[distribution_center]}")
-    else:
-        if df.empty or df.ID.isnull().all():
-            recent_schedule_id = 0
-        else:
-            recent_schedule_id = int(max(df.ID).split("-")[1])
+    # Same form session and same booking (supplier, invoice, date, center): same key, one schedule
+    form_session = st.session_state.setdefault("form_session", uuid.uuid4().hex)
+    key = submission_key(form_session, supplier_name, invoice, dropoff_date, distribution_center)
+
+    def book():
         new_schedule = {
-            "ID": f"SCHEDULE-{recent_schedule_id + 1}",
+            "ID": get_id_allocator().next_id(),
             "Supplier_Name": supplier_name,
             "Invoice_Number": invoice,
             "Dropoff_Date": dropoff_date,
@@ -136,34 +242,202 @@ if submitted:
             "SKU_Count": sku_number,
             "Created_At": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
+        # Check the daily limit, the opening window and the docks in use at the chosen time, take the
+        # slot, then insert the schedule
+        error = book_schedule(get_database(), new_schedule, key, get_capacity_index(), get_submission_guard(),
+                              change_log=get_change_log())
+        if error is not None:
+            st.error(error)
+            return None
+        get_schedule_store().invalidate()  # Let every session see the new schedule
+        # Queue the Pipefy card right after the commit, before anything is drawn (a rerun stops the
+        # script at the next Streamlit call); it is sent in the background so the submit does not wait on Pipefy
+        with tracer.span("pipefy_enqueue"):
+            card_title, card_fields = schedule_card(new_schedule)
+            get_pipefy_outbox().enqueue(title=card_title, fields=card_fields, schedule_id=new_schedule["ID"])
+        return new_schedule
 
-        # Insert schedule into the database
-        insert_schedule(new_schedule)
-
-        # Create Pipefy card
-        pipefy_content = {
-            'api_token': st.secrets["pipefy"]["api_token"],
-            'pipe_id': '305477886',
-            'title': f"Agendamento: {new_schedule['ID']}",
-            'fields': {
-                "fornecedor": supplier_name,
-                "data_do_agendamento": str(dropoff_date),
-                "hub": "HUB",
-                "cd": "CD",
-                "centro_de_distribui_o": distribution_center,
-                "fornecedor_paletizado": "Yes" if pallet_number > 0 else "No",
-                "se_sim_informe_a_quantidade_de_paletes": str(pallet_number),
-                "toneladas": str(total_weight),
-                "exige_cobran_a_de_descarga": "No",
-                "foi_agendado": status,
-                "observa_es_1": "Nenhuma observação",
-                "id": new_schedule["ID"]
-            }
-        }
+    schedule, duplicate = get_submission_guard().submit(key, book)
+    if schedule is not None:
+        if duplicate:
+            tracer.count("duplicate_submissions")
+            st.success("Este agendamento já tinha sido enviado e não foi criado de novo. Aqui estão os detalhes:")
+        else:
+            st.success("Agendamento enviado! Aqui estão os detalhes:")
+        st.dataframe(pd.DataFrame([schedule]), use_container_width=True, hide_index=True)
+        st.info("O card no Pipefy será criado em segundo plano.")
 
-        pipefy_result = create_pipefy_card(pipefy_content)
+# Section to view and edit existing schedules
+st.header("Agendamentos Existentes")
 
-        if pipefy_result["success"]:
-            st.success(f"Card criado no Pipefy com sucesso! ID: {pipefy_result['card_id']}, Título: {pipefy_result['card_title']}")
-        else:
-            st.error(f"Erro ao criar o card no Pipefy: {pipefy_result['error']}")
+# Filters are applied by the database; only the page on screen is read
+col_center, col_status, col_supplier = st.columns(3)
+distribution_center_filter = col_center.selectbox("Filtrar por Centro de Distribuição",
+                                                  ["Todos"] + distinct_centers(get_database()))
+status_filter = col_status.selectbox("Filtrar por Status", ["Todos", "Agendado", "Completo", "Cancelado"])
+supplier_filter = col_supplier.text_input("Filtrar por Indústria")
+col_date_from, col_date_to = st.columns(2)
+date_from_filter = col_date_from.date_input("Data inicial", value=None)
+date_to_filter = col_date_to.date_input("Data final", value=None)
+
+grid_filters = {
+    "center": None if distribution_center_filter == "Todos" else distribution_center_filter,
+    "status": None if status_filter == "Todos" else status_filter,
+    "supplier": supplier_filter.strip() or None,
+    "date_from": date_from_filter,
+    "date_to": date_to_filter,
+}
+
+# Cursors of the pages already visited; going back pops one, going forward pushes one
+if st.session_state.get("grid_filters") != grid_filters:
+    st.session_state["grid_filters"] = grid_filters
+    st.session_state["grid_cursors"] = [None]
+grid_cursors = st.session_state["grid_cursors"]
+
+with tracer.span("grid_query"):
+    grid_df, next_cursor = fetch_page(get_database(), grid_filters, after=grid_cursors[-1],
+                                      page_size=grid_page_size)
+    grid_count = count_schedules(get_database(), grid_filters)
+st.write(f"Número de Agendamentos: `{grid_count}` (página {len(grid_cursors)})")
+
+col_previous, col_next = st.columns(2)
+if col_previous.button("Página anterior", disabled=len(grid_cursors) == 1):
+    grid_cursors.pop()
+    st.rerun()
+if col_next.button("Próxima página", disabled=next_cursor is None):
+    grid_cursors.append(next_cursor)
+    st.rerun()
+
+st.info("Você pode alterar o status dos agendamentos ao clicar duas vezes na célula.", icon="✍️")
+
+# Pending edits are dropped when the page, the filters or the schedules shown change
+grid_editor_key = editor_key("schedules_editor", grid_df)
+st.data_editor(
+    grid_df,
+    key=grid_editor_key,
+    use_container_width=True,
+    hide_index=True,
+    column_config={
+        "Status": st.column_config.SelectboxColumn(
+            "Status",
+            help="Schedule status",
+            options=["Agendado", "Completo", "Cancelado"],
+            required=True,
+        ),
+    },
+    disabled=[column for column in grid_df.columns if column != "Status"],
+)
+
+# Save only the edited rows, as one UPDATE per kind of status change
+schedule_changes = editor_changes(grid_df, st.session_state[grid_editor_key]["edited_rows"])
+if schedule_changes and st.button("Salvar alterações"):
+    try:
+        with tracer.span("save_changes", rows=len(schedule_changes)):
+            saved = save_changes(get_database(), schedule_changes, change_log=get_change_log())
+    except SQLAlchemyError as e:
+        st.error(f"Erro ao salvar as alterações: {str(e)}")
+    else:
+        # Re-read the changed rows; the capacity index releases the slots of cancelled schedules
+        get_schedule_store().invalidate(saved["updated"] + saved["conflicts"])
+        st.success(f"{len(saved['updated'])} agendamentos atualizados.")
+        if saved["conflicts"]:
+            st.warning(f"Os agendamentos {', '.join(saved['conflicts'])} foram alterados por outra pessoa "
+                       f"e não foram salvos. Recarregue a página.")
+
+# Show some metrics and charts about the schedules
+st.header("Statistics")
+
+stats_center = None if distribution_center_filter == "Todos" else distribution_center_filter
+status_totals = get_schedule_stats().status_totals(stats_center)
+col1, col2, col3 = st.columns(3)
+col1.metric(label="Number of scheduled drop-offs", value=status_totals["Agendado"])
+col2.metric(label="Completo drop-offs", value=status_totals["Completo"])
+col3.metric(label="Cancelado drop-offs", value=status_totals["Cancelado"])
+
+with tracer.span("charts"):
+    status_plot, status_distribution_plot = status_charts(get_schedule_stats().summary(stats_center))
+
+st.write("")
+st.write("##### Drop-off status per month")
+st.altair_chart(status_plot, use_container_width=True, theme="streamlit")
+
+st.write("##### Current drop-off statuses")
+st.altair_chart(status_distribution_plot, use_container_width=True, theme="streamlit")
+
+# Unloading fees of the completed drop-offs of the months in memory; the oldest month is only
+# partly in the window, so it is not billed
+st.header("Cobrança de Descarga")
+col_invoice_by, col_invoice_month = st.columns(2)
+invoice_by = col_invoice_by.selectbox("Faturar por", ["Indústria", "Centro de Distribuição"])
+with tracer.span("billing"):
+    invoices = monthly_invoices(df, by="Supplier_Name" if invoice_by == "Indústria" else "Distribution_Center",
+                                complete_from=datetime.date.today() - datetime.timedelta(days=schedule_window_days))
+invoice_month = col_invoice_month.selectbox("Mês", sorted(invoices["Month"].unique(), reverse=True))
+month_invoices = invoices[invoices["Month"] == invoice_month]
+st.dataframe(month_invoices.assign(Total=month_invoices["Total_Cents"].map(format_brl))
+             .drop(columns=["Month", "Total_Cents"]), use_container_width=True, hide_index=True)
+st.write(f"Total do mês: `{format_brl(month_invoices['Total_Cents'].sum())}`")
+
+# Section to import many schedules at once
+st.header("Importar Agendamentos")
+st.write(
+    "Envie um arquivo CSV ou Excel com as colunas Indústria, Número da NF, Data, Horário, "
+    "Centro de Distribuição, Tipo de Carga, Número de Pallets, Peso Total e Número de SKUs. "
+    "Datas no formato DD/MM/AAAA (ou AAAA-MM-DD) e horários no formato HH:MM."
+)
+uploaded_file = st.file_uploader("Arquivo de agendamentos", type=["csv", "xlsx"])
+if uploaded_file is not None and st.button("Importar"):
+    from bulk_import import import_schedules, read_upload
+
+    try:
+        with tracer.span("bulk_import"):
+            import_result = import_schedules(get_database(), read_upload(uploaded_file), get_capacity_index(),
+                                             get_id_allocator(), change_log=get_change_log())
+    except SQLAlchemyError as e:
+        st.error(f"Erro ao importar os agendamentos: {str(e)}")
+    else:
+        imported = import_result[import_result["Accepted"]]
+        if not imported.empty:
+            get_schedule_store().invalidate()
+            get_pipefy_outbox().enqueue_many(
+                (*schedule_card(schedule), schedule["ID"]) for schedule in imported.to_dict("records")
+            )
+        st.success(f"{len(imported)} agendamentos importados, {len(import_result) - len(imported)} recusados.")
+        st.dataframe(import_result, use_container_width=True, hide_index=True)
+
+# Section to export the whole history, read from the database in chunks instead of all at once
+st.header("Exportar Agendamentos")
+col_export_center, col_export_format = st.columns(2)
+export_center = col_export_center.selectbox("Centro de Distribuição", ["Todos"] + distinct_centers(get_database()),
+                                            key="export_center")
+export_format = col_export_format.selectbox("Formato", list(export_formats), key="export_format")
+col_export_from, col_export_to = st.columns(2)
+export_filters = {
+    "center": None if export_center == "Todos" else export_center,
+    "date_from": col_export_from.date_input("Data inicial", value=None, key="export_date_from"),
+    "date_to": col_export_to.date_input("Data final", value=None, key="export_date_to"),
+}
+st.write(f"Agendamentos a exportar: `{count_schedules(get_database(), export_filters)}`")
+
+def build_export(database=get_database(), export_format=export_format, filters=dict(export_filters)):
+    # Runs on its own thread when the button is clicked, with the choices bound by the defaults above;
+    # the file is written chunk by chunk to a temporary file and only the finished file is handed to Streamlit
+    with tempfile.TemporaryFile() as file, tracer.span("export", format=export_format) as attributes:
+        attributes["rows"] = export_schedules(database, file, export_format, filters=filters)
+        file.seek(0)
+        return file.read()
+
+st.download_button(
+    "Baixar",
+    data=build_export,
+    file_name=f"agendamentos_{export_filters['center'] or 'todos'}.{export_formats[export_format]['extension']}",
+    mime=export_formats[export_format]["mime"],
+    on_click="ignore",
+)
+
+# Writes made by this run were already reported on the page; only later changes rerun it
+get_schedule_store().get()
+st.session_state["schedules_version"] = get_schedule_store().version
+follow_changes()
+
+tracer.record("rerun", time.perf_counter() - rerun_started)
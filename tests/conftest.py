@@ -0,0 +1,74 @@
+import datetime
+import os
+import sys
+
+import pytest
+from sqlalchemy import text
+
+# The modules of the app live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+
+create_table = """
+    CREATE TABLE Schedules (
+        ID VARCHAR(32) PRIMARY KEY,
+        Supplier_Name VARCHAR(255),
+        Invoice_Number VARCHAR(64),
+        Dropoff_Date DATE,
+        Dropoff_Time VARCHAR(8),
+        Status VARCHAR(16),
+        Distribution_Center VARCHAR(32),
+        Load_Type VARCHAR(32),
+        Pallet_Number INTEGER,
+        Total_Weight INTEGER,
+        SKU_Count INTEGER,
+        Created_At VARCHAR(19)
+    )
+"""
+
+insert_query = text("""
+    INSERT INTO Schedules
+    (ID, Supplier_Name, Invoice_Number, Dropoff_Date, Dropoff_Time, Status, Distribution_Center, Load_Type,
+    Pallet_Number, Total_Weight, SKU_Count, Created_At)
+    VALUES (:ID, :Supplier_Name, :Invoice_Number, :Dropoff_Date, :Dropoff_Time, :Status,
+            :Distribution_Center, :Load_Type, :Pallet_Number, :Total_Weight, :SKU_Count, :Created_At)
+""")
+
+
+def make_schedule(schedule_id, days_from_today=7, status="Agendado", center="CLAS", time="08:00",
+                  load_type="Estivado", invoice=None):
+    """Return a schedule with the Schedules table columns, dropped off `days_from_today` from today."""
+    return {
+        "ID": schedule_id,
+        "Supplier_Name": "Indústria",
+        "Invoice_Number": invoice or schedule_id,
+        "Dropoff_Date": datetime.date.today() + datetime.timedelta(days=days_from_today),
+        "Dropoff_Time": time,
+        "Status": status,
+        "Distribution_Center": center,
+        "Load_Type": load_type,
+        "Pallet_Number": 10,
+        "Total_Weight": 1000,
+        "SKU_Count": 1,
+        "Created_At": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+@pytest.fixture
+def database(tmp_path):
+    """A `Database` on a SQLite file with an empty Schedules table."""
+    database = Database(f"sqlite:///{tmp_path / 'schedules.db'}", connect_args={"timeout": 30}, pool_size=16)
+    with database.begin() as conn:
+        conn.execute(text(create_table))
+    yield database
+    database.engine.dispose()
+
+
+@pytest.fixture
+def insert(database):
+    """Insert schedules made with `make_schedule`."""
+    def insert(*schedules):
+        with database.begin() as conn:
+            conn.execute(insert_query, list(schedules))
+    return insert
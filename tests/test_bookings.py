@@ -0,0 +1,84 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import rules
+from bookings import book_schedule
+from capacity import CapacityIndex
+from conftest import make_schedule
+from submissions import SubmissionGuard, submission_key
+
+
+def make_index(max_schedules=2):
+    return CapacityIndex(max_schedules={center: max_schedules for center in rules.max_schedules})
+
+
+def key_for(schedule):
+    return submission_key("session", schedule["Supplier_Name"], schedule["Invoice_Number"],
+                          schedule["Dropoff_Date"], schedule["Distribution_Center"])
+
+
+def count_rows(database):
+    with database.connect() as conn:
+        return conn.exec_driver_sql("SELECT COUNT(*) FROM Schedules").scalar_one()
+
+
+def test_concurrent_bookings_never_exceed_the_daily_limit(database):
+    index, guard = make_index(max_schedules=3), SubmissionGuard(database)
+    schedules = [make_schedule(f"SCHEDULE-{number}", time=f"{8 + number % 8:02d}:00") for number in range(24)]
+
+    with ThreadPoolExecutor(max_workers=12) as executor:
+        errors = list(executor.map(
+            lambda schedule: book_schedule(database, schedule, key_for(schedule), index, guard), schedules))
+
+    assert sum(error is None for error in errors) == 3
+    assert count_rows(database) == 3
+    assert index.count("CLAS", schedules[0]["Dropoff_Date"]) == 3
+
+
+def test_failed_insert_releases_the_slot(database, insert):
+    index, guard = make_index(max_schedules=1), SubmissionGuard(database)
+    insert(make_schedule("SCHEDULE-1", days_from_today=30))
+    # Same ID as an existing schedule: the insert fails on the primary key, not on the submission key
+    schedule = make_schedule("SCHEDULE-1", invoice="NF-2")
+
+    error = book_schedule(database, schedule, key_for(schedule), index, guard)
+
+    assert error.startswith("Erro ao inserir o agendamento")
+    assert index.count("CLAS", schedule["Dropoff_Date"]) == 0
+    assert book_schedule(database, make_schedule("SCHEDULE-2"), key_for(schedule), index, guard) is None
+
+
+def test_rejected_booking_is_not_inserted(database):
+    index, guard = make_index(max_schedules=1), SubmissionGuard(database)
+    first, second = make_schedule("SCHEDULE-1"), make_schedule("SCHEDULE-2", invoice="NF-2")
+
+    assert book_schedule(database, first, key_for(first), index, guard) is None
+    assert "Não é possível agendar" in book_schedule(database, second, key_for(second), index, guard)
+    assert count_rows(database) == 1
+
+
+def test_index_is_not_locked_during_the_insert(database):
+    index, guard = make_index(), SubmissionGuard(database)
+    inserting, release = threading.Event(), threading.Event()
+    record = guard.record
+
+    def slow_record(*args):
+        inserting.set()
+        release.wait(5)
+        record(*args)
+
+    guard.record = slow_record
+    schedule = make_schedule("SCHEDULE-1")
+    booking = threading.Thread(target=book_schedule, args=(database, schedule, key_for(schedule), index, guard))
+    booking.start()
+    try:
+        assert inserting.wait(5)
+        # Another session checks (and the store updates the index) while the insert is running
+        checked = threading.Thread(target=index.check, args=("CLAS", schedule["Dropoff_Date"], "09:00", "Estivado"))
+        checked.start()
+        checked.join(1)
+        assert not checked.is_alive()
+        assert index.count("CLAS", schedule["Dropoff_Date"]) == 1
+    finally:
+        release.set()
+        booking.join()
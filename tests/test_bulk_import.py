@@ -0,0 +1,92 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy.exc import SQLAlchemyError
+
+import bulk_import
+import rules
+from bookings import book_schedule
+from bulk_import import import_schedules, validate_schedules
+from capacity import CapacityIndex
+from conftest import make_schedule
+from schedule_ids import ScheduleIdAllocator
+from submissions import SubmissionGuard, submission_key
+
+
+def make_index(max_schedules=2):
+    # Only the daily limit is tested here: every row is dropped off at the same time
+    return CapacityIndex(max_schedules={center: max_schedules for center in rules.max_schedules},
+                         max_simultaneous=100)
+
+
+def make_rows(count, invoice_prefix="NF", days_from_today=7):
+    return [{key: value for key, value in make_schedule(None, days_from_today=days_from_today,
+                                                        invoice=f"{invoice_prefix}-{number}").items()
+             if key not in ("ID", "Created_At")}
+            for number in range(count)]
+
+
+def count_rows(database):
+    with database.connect() as conn:
+        return conn.exec_driver_sql("SELECT COUNT(*) FROM Schedules").scalar_one()
+
+
+def test_field_checks_reject_invalid_rows():
+    rows = make_rows(3)
+    rows[1]["Distribution_Center"] = "XXXX"
+    rows[2]["Dropoff_Time"] = "03:00"
+
+    result = validate_schedules(rows)
+
+    assert list(result["Accepted"]) == [True, False, False]
+    assert result.loc[1, "Reason"] == "Centro de Distribuição inválido"
+
+
+def test_rows_of_a_batch_compete_for_the_same_slots(database):
+    index = make_index(max_schedules=2)
+
+    result = import_schedules(database, make_rows(3), index, ScheduleIdAllocator(database))
+
+    assert list(result["Accepted"]) == [True, True, False]
+    assert result.loc[2, "ID"] is None
+    assert count_rows(database) == 2
+    assert index.count("CLAS", result.loc[0, "Dropoff_Date"]) == 2
+
+
+def test_concurrent_imports_and_submits_never_exceed_the_daily_limit(database):
+    index, guard, allocator = make_index(max_schedules=4), SubmissionGuard(database), ScheduleIdAllocator(database)
+    start = threading.Barrier(4)
+
+    def run_import(prefix):
+        start.wait()
+        return int(import_schedules(database, make_rows(3, invoice_prefix=prefix), index, allocator)["Accepted"].sum())
+
+    def run_submit(invoice):
+        schedule = make_schedule(allocator.next_id(), invoice=invoice)
+        key = submission_key("session", schedule["Supplier_Name"], invoice, schedule["Dropoff_Date"], "CLAS")
+        start.wait()
+        return int(book_schedule(database, schedule, key, index, guard) is None)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        accepted = [executor.submit(run_import, "A"), executor.submit(run_import, "B"),
+                    executor.submit(run_submit, "NF-X"), executor.submit(run_submit, "NF-Y")]
+        accepted = sum(future.result() for future in accepted)
+
+    assert accepted == 4
+    assert count_rows(database) == 4
+
+
+def test_failed_import_releases_its_slots(database, monkeypatch):
+    index = make_index(max_schedules=2)
+
+    def fail(*args, **kwargs):
+        raise SQLAlchemyError("connection lost")
+
+    monkeypatch.setattr(bulk_import, "insert_schedules", fail)
+    with pytest.raises(SQLAlchemyError):
+        import_schedules(database, make_rows(2), index, ScheduleIdAllocator(database))
+    monkeypatch.undo()
+
+    assert index.count("CLAS", make_rows(1)[0]["Dropoff_Date"]) == 0
+    assert import_schedules(database, make_rows(2), index, ScheduleIdAllocator(database))["Accepted"].all()
@@ -0,0 +1,116 @@
+import datetime
+import glob
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from file_storage import ScheduleFileStorage, fcntl
+
+month = "2026-10"
+
+
+def make_row(number, status="Agendado"):
+    return {
+        "ID": f"SCHEDULE-{number}",
+        "Indústria": "Indústria",
+        "Número da NF": str(number),
+        "Drop-off Date": datetime.date(2026, 10, 20),
+        "Drop-off Time": "08:00",
+        "Status": status,
+        "Centro de Distribuição": "CLAS",
+        "Tipo de Carga": "Estivado",
+        "Número de Pallets": 1,
+        "Peso Total": 1000,
+        "Número de SKUs": 1,
+        "Data de Criação": "2026-10-01 08:00:00",
+    }
+
+
+@pytest.fixture
+def storages(tmp_path):
+    # Two instances on one directory stand for two processes: they share no lock in memory
+    root = str(tmp_path / "schedules_data")
+    return (ScheduleFileStorage(root=root, legacy_csv_path=None),
+            ScheduleFileStorage(root=root, legacy_csv_path=None))
+
+
+def test_compaction_keeps_the_latest_version(storages):
+    storage, _ = storages
+    storage.append([make_row(1), make_row(2)])
+    storage.update([make_row(1, status="Cancelado")])
+    storage.compact(month)
+
+    assert [os.path.basename(path) for path in glob.glob(os.path.join(storage.root, f"month={month}", "*"))] \
+        == ["base.parquet"]
+    rows = storage.read().set_index("ID")
+    assert rows.loc["SCHEDULE-1", "Status"] == "Cancelado"
+    assert len(rows) == 2
+
+
+@pytest.mark.skipif(fcntl is None, reason="no lock between processes on this platform")
+def test_concurrent_compaction_loses_no_booking(storages):
+    first, second = storages
+    first.append([make_row(1)])
+    first.append([make_row(2)])
+
+    # While the first instance compacts from what it read, the second appends and compacts too
+    read_month = first._read_month
+    other = threading.Thread(target=lambda: (second.append([make_row(3)]), second.compact(month)))
+
+    def read_then_race(name):
+        rows = read_month(name)
+        other.start()
+        other.join(timeout=0.5)
+        return rows
+
+    first._read_month = read_then_race
+    first.compact(month)
+    first._read_month = read_month
+    other.join()
+
+    assert sorted(first.read()["ID"]) == ["SCHEDULE-1", "SCHEDULE-2", "SCHEDULE-3"]
+
+
+@pytest.mark.skipif(fcntl is None, reason="no lock between processes on this platform")
+def test_next_id_is_unique_across_instances(storages):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        ids = list(executor.map(lambda number: storages[number % 2].next_id(), range(400)))
+    assert len(set(ids)) == 400
+
+
+def test_update_skips_rows_changed_since_the_edit_started(storages):
+    storage, other = storages
+    storage.append([make_row(1)])
+    other.update([make_row(1, status="Completo")], expected={"SCHEDULE-1": {"Status": "Agendado"}})
+
+    saved = storage.update([make_row(1, status="Cancelado")], expected={"SCHEDULE-1": {"Status": "Agendado"}})
+
+    assert saved == {"updated": [], "conflicts": ["SCHEDULE-1"]}
+    assert storage.read().set_index("ID").loc["SCHEDULE-1", "Status"] == "Completo"
+
+
+def test_compactor_keeps_running_after_a_failure(storages):
+    storage, _ = storages
+    passes = []
+    compact_all = storage._compact_all
+
+    def fail_once(max_deltas):
+        passes.append(max_deltas)
+        if len(passes) == 1:
+            raise OSError("disk full")
+        compact_all(max_deltas)
+
+    storage._compact_all = fail_once
+    storage.append([make_row(1)])
+    storage.append([make_row(2)])
+    storage.start_compactor(interval=0.01, max_deltas=1)
+    try:
+        deadline = datetime.datetime.now() + datetime.timedelta(seconds=5)
+        while len(passes) < 3 and datetime.datetime.now() < deadline:
+            threading.Event().wait(0.01)
+        assert len(passes) >= 3 and storage._compactor.is_alive()
+    finally:
+        storage.stop_compactor()
+    assert len(storage._files(month)) == 1
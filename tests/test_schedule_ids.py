@@ -0,0 +1,47 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import make_schedule
+from schedule_ids import ScheduleIdAllocator, format_schedule_id, parse_schedule_id
+
+
+def count_ids(database):
+    with database.connect() as conn:
+        return tuple(conn.exec_driver_sql("SELECT COUNT(*), COUNT(DISTINCT ID) FROM Schedules").one())
+
+
+@pytest.mark.parametrize("block_size", [1, 50])
+def test_parallel_submits_never_get_the_same_id(database, insert, block_size):
+    # Every worker has its own allocator, like separate processes: only the counter row keeps IDs apart
+    ScheduleIdAllocator(database, block_size=block_size)
+    workers = threading.local()
+
+    def submit(_):
+        if not hasattr(workers, "allocator"):
+            workers.allocator = ScheduleIdAllocator(database, block_size=block_size)
+        insert(make_schedule(workers.allocator.next_id()))
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(submit, range(500)))
+
+    assert count_ids(database) == (500, 500)
+
+
+def test_shared_allocator_hands_out_unique_ids(database):
+    allocator = ScheduleIdAllocator(database, block_size=10)
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        ids = list(executor.map(lambda _: allocator.next_id(), range(500)))
+    ids += allocator.allocate(100)
+
+    assert len(set(ids)) == 600
+
+
+def test_counter_starts_after_existing_ids(database, insert):
+    insert(make_schedule(format_schedule_id(41)), make_schedule("legacy"))
+
+    allocator = ScheduleIdAllocator(database)
+
+    assert parse_schedule_id(allocator.next_id()) == 42
+    assert [parse_schedule_id(schedule_id) for schedule_id in allocator.allocate(3)] == [43, 44, 45]
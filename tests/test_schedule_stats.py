@@ -0,0 +1,88 @@
+import datetime
+
+from sqlalchemy import text
+
+from change_log import ScheduleChangeLog
+from conftest import make_schedule
+from edits import save_changes
+from schedule_queries import fetch_status_rows
+from schedule_stats import ScheduleStats
+from schedule_store import ScheduleStore
+
+
+def follow(database, window_days=90, change_log=None):
+    # Wired like get_schedule_stats in teste.py: history seeded, window followed through the store
+    store = ScheduleStore(database, window_days=window_days, refresh_interval=0, change_log=change_log)
+    stats = ScheduleStats()
+    window_start = datetime.date.today() - datetime.timedelta(days=window_days)
+    stats.seed(fetch_status_rows(database, {"date_to": window_start - datetime.timedelta(days=1)}))
+    store.add_listener(stats.apply_rows)
+    store.get()
+    return store, stats
+
+
+def cancel(database, store, schedule_id, change_log=None):
+    save_changes(database, [(schedule_id, {"Status": ("Agendado", "Cancelado")})], change_log=change_log)
+    store.invalidate([schedule_id])
+    store.get()
+
+
+def test_counts_history_older_than_window(database, insert):
+    insert(make_schedule("SCHEDULE-1", days_from_today=-200), make_schedule("SCHEDULE-2"))
+    _, stats = follow(database)
+    assert stats.status_totals() == {"Agendado": 2, "Completo": 0, "Cancelado": 0}
+
+
+def test_edit_of_seeded_schedule_moves_its_count(database, insert):
+    insert(make_schedule("SCHEDULE-1", days_from_today=-200), make_schedule("SCHEDULE-2"))
+    store, stats = follow(database)
+
+    cancel(database, store, "SCHEDULE-1")
+
+    assert stats.status_totals() == {"Agendado": 1, "Completo": 0, "Cancelado": 1}
+    month = (datetime.date.today() - datetime.timedelta(days=200)).strftime("%Y-%m")
+    summary = stats.summary().set_index(["Month", "Status"])["Count"]
+    assert summary[(month, "Cancelado")] == 1
+    assert (month, "Agendado") not in summary.index
+    # The store keeps its window
+    assert set(store.get()["ID"]) == {"SCHEDULE-2"}
+
+
+def test_edit_of_schedule_that_left_the_window_moves_its_count(database, insert):
+    insert(make_schedule("SCHEDULE-1", days_from_today=-60), make_schedule("SCHEDULE-2"))
+    store, stats = follow(database)
+    # A month later the first schedule is no longer in the window
+    store.window_days = 30
+    store.invalidate()
+    store.get()
+
+    cancel(database, store, "SCHEDULE-1")
+
+    assert stats.status_totals() == {"Agendado": 1, "Completo": 0, "Cancelado": 1}
+
+
+def test_edit_outside_window_through_change_log(database, insert):
+    change_log = ScheduleChangeLog(database)
+    insert(make_schedule("SCHEDULE-1", days_from_today=-200), make_schedule("SCHEDULE-2"))
+    store, stats = follow(database, change_log=change_log)
+
+    # Saved by another process: only the change log tells this one
+    save_changes(database, [("SCHEDULE-1", {"Status": ("Agendado", "Completo")})], change_log=change_log)
+    store.get()
+
+    assert stats.status_totals() == {"Agendado": 1, "Completo": 1, "Cancelado": 0}
+
+
+def test_deleted_schedule_is_no_longer_counted(database, insert):
+    insert(make_schedule("SCHEDULE-1", days_from_today=-200), make_schedule("SCHEDULE-2"))
+    store, stats = follow(database)
+    removed = []
+    store.add_listener(lambda rows, removed_ids: removed.extend(removed_ids))
+
+    with database.begin() as conn:
+        conn.execute(text("DELETE FROM Schedules"))
+    store.invalidate(["SCHEDULE-1", "SCHEDULE-2"])
+    store.get()
+
+    assert sorted(removed) == ["SCHEDULE-1", "SCHEDULE-2"]
+    assert stats.status_totals() == {"Agendado": 0, "Completo": 0, "Cancelado": 0}
@@ -0,0 +1,114 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+
+import rules
+from bookings import book_schedule
+from capacity import CapacityIndex
+from conftest import make_schedule
+from schedule_ids import ScheduleIdAllocator
+from submissions import SubmissionGuard, submission_key
+
+
+class Process:
+    """One app process: its own guard, capacity index and ID allocator, on the shared database."""
+
+    def __init__(self, database, cards):
+        self.database = database
+        self.cards = cards
+        self.guard = SubmissionGuard(database)
+        self.capacity = CapacityIndex(max_schedules={center: 1000 for center in rules.max_schedules},
+                                      max_simultaneous=1000)
+        self.allocator = ScheduleIdAllocator(database)
+
+    def send(self, invoice, pipefy_seconds=0.05):
+        # Like the submit block of teste.py: book through the guard, then create the card
+        schedule = make_schedule(None, invoice=invoice)
+        key = submission_key("session", schedule["Supplier_Name"], invoice, schedule["Dropoff_Date"],
+                             schedule["Distribution_Center"])
+
+        def book():
+            schedule["ID"] = self.allocator.next_id()
+            if book_schedule(self.database, schedule, key, self.capacity, self.guard) is not None:
+                return None
+            time.sleep(pipefy_seconds)
+            self.cards.append(schedule["ID"])
+            return schedule
+
+        return self.guard.submit(key, book)
+
+
+def count_by_invoice(database):
+    with database.connect() as conn:
+        return dict(conn.exec_driver_sql("SELECT Invoice_Number, COUNT(*) FROM Schedules "
+                                         "GROUP BY Invoice_Number").all())
+
+
+def test_double_submits_create_one_schedule(database):
+    cards = []
+    processes = [Process(database, cards), Process(database, cards)]
+
+    for round_number in range(10):
+        invoice = f"NF-{round_number}"
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(lambda number: processes[number % 2].send(invoice), range(16)))
+
+        assert len({schedule["ID"] for schedule, _ in results}) == 1
+        assert sum(not duplicate for _, duplicate in results) == 1
+
+    assert count_by_invoice(database) == {f"NF-{number}": 1 for number in range(10)}
+    assert len(cards) == 10
+
+
+def test_race_between_processes_returns_the_first_schedule(database):
+    cards = []
+    first, second = Process(database, cards), Process(database, cards)
+    # The second process looks the key up before the first one inserts, and inserts after it
+    looked_up, inserted = threading.Event(), threading.Event()
+    find = second.guard.find
+
+    def find_then_wait(key):
+        result = find(key)
+        if not looked_up.is_set():
+            looked_up.set()
+            inserted.wait(5)
+        return result
+
+    second.guard.find = find_then_wait
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        racing = executor.submit(second.send, "NF-1")
+        assert looked_up.wait(5)
+        schedule, duplicate = first.send("NF-1")
+        inserted.set()
+        raced, raced_duplicate = racing.result()
+
+    assert not duplicate and raced_duplicate
+    assert raced["ID"] == schedule["ID"]
+    assert count_by_invoice(database) == {"NF-1": 1}
+    assert cards == [schedule["ID"]]
+    # The slot taken by the rolled back insert was released
+    assert second.capacity.count("CLAS", schedule["Dropoff_Date"]) == 0
+
+
+def test_repeat_is_answered_from_memory(database):
+    process = Process(database, [])
+    schedule, _ = process.send("NF-1", pipefy_seconds=0)
+
+    queries = []
+    event.listen(database.engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+    repeat, duplicate = process.send("NF-1")
+
+    assert duplicate and repeat["ID"] == schedule["ID"]
+    assert not queries
+
+
+def test_rejected_booking_can_be_sent_again(database):
+    process = Process(database, [])
+    process.capacity.max_schedules = {center: 0 for center in rules.max_schedules}
+    assert process.send("NF-1") == (None, False)
+
+    process.capacity.max_schedules = {center: 1 for center in rules.max_schedules}
+    schedule, duplicate = process.send("NF-1", pipefy_seconds=0)
+    assert not duplicate and schedule["Invoice_Number"] == "NF-1"
@@ -0,0 +1,192 @@
+import collections
+import contextlib
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("descarregar.trace")
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Tracer:
+    """
+    Timing spans, counters and gauges of the app, kept per process.
+
+    Every span adds its duration to a rolling window of the last `window` measurements of its
+    phase (for the p50/p95/p99 shown on the admin page) and to running totals (for Prometheus),
+    and writes one JSON line to the 'descarregar.trace' logger. Gauges are read from callbacks
+    when the metrics are exported, e.g. the state of the database pool.
+
+    Parameters:
+        window (int): Measurements kept per phase to compute the percentiles.
+    """
+
+    def __init__(self, window=2048):
+        self.window = window
+        self._lock = threading.Lock()
+        self._durations = collections.defaultdict(lambda: collections.deque(maxlen=self.window))
+        self._totals = collections.defaultdict(lambda: [0, 0.0])
+        self._counters = collections.Counter()
+        self._gauges = {}
+
+    def record(self, phase, seconds, **attributes):
+        """Store the duration of a phase and log it."""
+        with self._lock:
+            self._durations[phase].append(seconds)
+            totals = self._totals[phase]
+            totals[0] += 1
+            totals[1] += seconds
+        logger.info(json.dumps({"event": "span", "phase": phase, "duration_ms": round(seconds * 1000, 3),
+                                **attributes}, default=str))
+
+    @contextlib.contextmanager
+    def span(self, phase, **attributes):
+        """Time the block as `phase`. Attributes are added to the log line."""
+        started = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            self.record(phase, time.perf_counter() - started, **attributes)
+
+    def count(self, name, amount=1, **labels):
+        """Increase a counter, e.g. `count("pipefy_requests", status="200")`."""
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += amount
+
+    def register_gauges(self, prefix, callback):
+        """
+        Read gauges from `callback` on every export.
+
+        The callback returns a dict of numbers; each becomes the gauge `<prefix>_<key>`.
+        """
+        with self._lock:
+            self._gauges[prefix] = callback
+
+    def _read_gauges(self):
+        with self._lock:
+            callbacks = list(self._gauges.items())
+        gauges = {}
+        for prefix, callback in callbacks:
+            for key, value in callback().items():
+                if isinstance(value, (int, float)):
+                    gauges[f"{prefix}_{key}"] = value
+        return gauges
+
+    def snapshot(self):
+        """
+        Return the current metrics.
+
+        Returns:
+            dict: 'phases' (count, p50, p95, p99 in milliseconds per phase), 'counters' and 'gauges'.
+        """
+        with self._lock:
+            windows = {phase: sorted(durations) for phase, durations in self._durations.items()}
+            totals = {phase: tuple(values) for phase, values in self._totals.items()}
+            counters = dict(self._counters)
+        phases = {}
+        for phase, ordered in windows.items():
+            if not ordered:
+                continue
+            phases[phase] = {
+                "count": totals[phase][0],
+                "p50_ms": _percentile(ordered, 0.50) * 1000,
+                "p95_ms": _percentile(ordered, 0.95) * 1000,
+                "p99_ms": _percentile(ordered, 0.99) * 1000,
+            }
+        return {
+            "phases": phases,
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in sorted(counters.items())],
+            "gauges": self._read_gauges(),
+        }
+
+    def prometheus_text(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        with self._lock:
+            windows = {phase: sorted(durations) for phase, durations in self._durations.items()}
+            totals = {phase: tuple(values) for phase, values in self._totals.items()}
+            counters = dict(self._counters)
+
+        lines = ["# HELP app_phase_seconds Duration of each phase of a script run.",
+                 "# TYPE app_phase_seconds summary"]
+        for phase, ordered in sorted(windows.items()):
+            if not ordered:
+                continue
+            for quantile in (0.5, 0.95, 0.99):
+                lines.append(f'app_phase_seconds{{phase="{phase}",quantile="{quantile}"}} '
+                             f'{_percentile(ordered, quantile):.6f}')
+            lines.append(f'app_phase_seconds_count{{phase="{phase}"}} {totals[phase][0]}')
+            lines.append(f'app_phase_seconds_sum{{phase="{phase}"}} {totals[phase][1]:.6f}')
+
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE app_{name}_total counter")
+            for (counter_name, labels), value in sorted(counters.items()):
+                if counter_name == name:
+                    label_text = ",".join(f'{key}="{label}"' for key, label in labels)
+                    lines.append(f"app_{name}_total{{{label_text}}} {value}")
+
+        for name, value in sorted(self._read_gauges().items()):
+            lines.append(f"# TYPE app_{name} gauge")
+            lines.append(f"app_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Shared by every module of the process
+tracer = Tracer()
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """
+    Serve `tracer.prometheus_text()` on http://<host>:<port>/metrics from a background thread.
+
+    Returns:
+        ThreadingHTTPServer: The running server.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            payload = tracer.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+def start_trace_log(path=None, level=logging.INFO):
+    """
+    Write the JSON lines of the spans somewhere; without a handler the 'descarregar.trace' logger drops them.
+
+    Parameters:
+        path (str): File the lines are appended to. Defaults to the standard error of the process.
+        level (int): Lowest level written; spans are logged at INFO.
+
+    Returns:
+        logging.Handler: The handler, already attached. Calling again returns the same one.
+    """
+    for handler in logger.handlers:
+        if getattr(handler, "trace_log", False):
+            return handler
+    handler = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler()
+    handler.trace_log = True
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    # One JSON object per line, not repeated by the handlers of the root logger
+    logger.propagate = False
+    return handler
+